@@ -6,8 +6,9 @@ Source: http://www.github.com/kellerza/pysma
 """
 
 import asyncio
+import ipaddress
 import logging
-from typing import Optional
+from typing import AsyncIterator, Iterable, Optional
 
 from aiohttp import ClientSession
 
@@ -17,7 +18,8 @@ from .device_ennexos import SMAennexos
 from .device_shm2 import SHM2
 from .device_speedwire import SMAspeedwireINV
 from .device_webconnect import SMAwebconnect
-from .discovery import Discovery
+from .discovery import DiscoveredDevice, Discovery
+from .probe import PROBE_TIMEOUT, TRANSPORTS, probeAccessMethods
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -57,10 +59,18 @@ def getDevice(
     return None
 
 
+# Access methods tested by autoDetect (no energy meters)
+DETECT_ACCESSMETHODS = ["ennexos", "speedwireinv", "webconnect", "speedwireem", "shm2"]
+
+
 async def _run_detect(
-    accessmethod: str, session: ClientSession, ip: str
+    accessmethod: str, session: ClientSession, ip: str, timeout: float | None = None
 ) -> list[DiscoveryInformation]:
-    """Start Autodetection for one ip and for one accessmethod"""
+    """Start Autodetection for one ip and for one accessmethod
+
+    If the detection takes longer than timeout seconds, a failed
+    DiscoveryInformation with a TimeoutError is returned.
+    """
     sma: Device
     if accessmethod == "webconnect":
         sma = SMAwebconnect(session, ip, password="", group="user")
@@ -74,33 +84,174 @@ async def _run_detect(
         sma = SHM2(ip, "0")
     else:
         return []
-    ret = await sma.detect(ip)
+    try:
+        ret = await asyncio.wait_for(sma.detect(ip), timeout)
+    except asyncio.TimeoutError as e:
+        di = DiscoveryInformation()
+        di.tested_endpoints = ip
+        di.status = "failed"
+        di.exception = e
+        di.remark = f"no answer within {timeout} s"
+        ret = [di]
+    finally:
+        try:
+            await sma.close_session()
+        except Exception:  # pylint: disable=broad-exception-caught
+            pass
     for i in ret:
         i.access = accessmethod
-    try:
-        await sma.close_session()
-    except Exception:  # pylint: disable=broad-exception-caught
-        pass
     return ret
 
 
-async def autoDetect(session: ClientSession, ip: str) -> list[DiscoveryInformation]:
-    # pylint: disable=invalid-name
-    """Runs a autodetection of all supported devices (no energy meters) on the ip-address"""
-    ret = await asyncio.gather(
-        _run_detect("ennexos", session, ip),
-        _run_detect("speedwireinv", session, ip),
-        _run_detect("webconnect", session, ip),
-        _run_detect("speedwireem", session, ip),
-        _run_detect("shm2", session, ip),
+def _not_answered(ip: str, accessmethod: str) -> DiscoveryInformation:
+    """DiscoveryInformation of an access method skipped after the probe"""
+    di = DiscoveryInformation()
+    di.tested_endpoints = ip
+    di.status = "failed"
+    di.access = accessmethod
+    di.remark = "no answer on " + ", ".join(
+        f"{protocol}/{port}" for protocol, port in TRANSPORTS[accessmethod]
     )
+    return di
+
+
+async def autoDetect(
+    session: ClientSession, ip: str, probeTimeout: float | None = PROBE_TIMEOUT
+) -> list[DiscoveryInformation]:
+    # pylint: disable=invalid-name
+    """Runs a autodetection of all supported devices (no energy meters) on the ip-address
+
+    The transports of the access methods are probed first and only the
+    access methods that answered are detected. A probeTimeout of None
+    disables the probe.
+    """
     results: list[DiscoveryInformation] = []
+    methods = DETECT_ACCESSMETHODS
+    if probeTimeout is not None:
+        answered = await probeAccessMethods(ip, methods, probeTimeout)
+        results.extend(_not_answered(ip, m) for m in methods if not answered[m])
+        methods = [m for m in methods if answered[m]]
+    ret = await asyncio.gather(*(_run_detect(m, session, ip) for m in methods))
     for r in ret:
         results.extend(r)
     return results
 
 
+async def _detect_host(
+    session: ClientSession,
+    ip: str,
+    accessmethods: list[str],
+    shortTimeout: float,
+    probeTimeout: float | None,
+    limit: asyncio.Semaphore,
+) -> list[DiscoveryInformation]:
+    """Autodetection of one ip with short timeouts.
+
+    Only the access methods whose transport answered the probe are
+    detected. The access methods that timed out are tested again without
+    the short timeout, if their transport answered the probe or (without
+    probe) another access method found a device.
+    """
+    skipped: list[DiscoveryInformation] = []
+    if probeTimeout is not None:
+        async with limit:
+            answered = await probeAccessMethods(ip, accessmethods, probeTimeout)
+        skipped = [_not_answered(ip, m) for m in accessmethods if not answered[m]]
+        accessmethods = [m for m in accessmethods if answered[m]]
+
+    async def probe(method: str, timeout: float | None) -> list[DiscoveryInformation]:
+        async with limit:
+            return await _run_detect(method, session, ip, timeout)
+
+    ret = await asyncio.gather(*(probe(m, shortTimeout) for m in accessmethods))
+    results = dict(zip(accessmethods, ret))
+    alive = probeTimeout is not None or any(
+        di.status in ["found", "maybe"] for r in results.values() for di in r
+    )
+    timedOut = [
+        method
+        for method, r in results.items()
+        if any(isinstance(di.exception, asyncio.TimeoutError) for di in r)
+    ]
+    if alive and timedOut:
+        _LOGGER.debug("Detect %s again without timeout: %s", ip, timedOut)
+        ret = await asyncio.gather(*(probe(m, None) for m in timedOut))
+        results.update(zip(timedOut, ret))
+    return skipped + [di for r in results.values() for di in r]
+
+
+async def autoDetectRange(
+    session: ClientSession,
+    hosts: str | Iterable[str],
+    maxConcurrency: int = 64,
+    shortTimeout: float = 3.0,
+    accessmethods: list[str] | None = None,
+    probeTimeout: float | None = PROBE_TIMEOUT,
+) -> AsyncIterator[tuple[str, DiscoveryInformation]]:
+    # pylint: disable=invalid-name
+    """Runs a autodetection on many ip-addresses.
+
+    Args:
+        session: aiohttp client session
+        hosts: network in CIDR notation (e.g. "192.168.1.0/24") or ip-addresses
+        maxConcurrency: maximum number of detections running at the same time
+        shortTimeout: timeout of the first detection of each access method
+        accessmethods: access methods to test. Defaults to all of autoDetect.
+        probeTimeout: timeout of the transport probes, None to disable them
+
+    Yields:
+        (ip, DiscoveryInformation) of each found device, as soon as the
+        detection of its ip is finished.
+    """
+    if isinstance(hosts, str):
+        network = ipaddress.ip_network(hosts, strict=False)
+        hosts = (str(ip) for ip in network.hosts())
+    ips = iter(hosts)
+    methods = accessmethods or DETECT_ACCESSMETHODS
+    limit = asyncio.Semaphore(maxConcurrency)
+    queue: asyncio.Queue[tuple[str, DiscoveryInformation] | None] = asyncio.Queue()
+
+    async def worker() -> None:
+        for ip in ips:
+            for di in await _detect_host(
+                session, ip, methods, shortTimeout, probeTimeout, limit
+            ):
+                if di.status in ["found", "maybe"]:
+                    queue.put_nowait((ip, di))
+
+    async def run() -> None:
+        try:
+            await asyncio.gather(*(worker() for _ in range(maxConcurrency)))
+        finally:
+            queue.put_nowait(None)
+
+    task = asyncio.create_task(run())
+    try:
+        while (item := await queue.get()) is not None:
+            yield item
+        await task
+    finally:
+        task.cancel()
+
+
 async def discovery() -> list:
     """Perform a scan of the local network"""
     discover = Discovery(asyncio.get_event_loop())
     return await discover.run()
+
+
+async def discoverDevices(
+    quietPeriod: float = 1.0,
+    expected: int | None = None,
+    password: str | None = None,
+    group: str = "user",
+) -> list[DiscoveredDevice]:
+    # pylint: disable=invalid-name
+    """Perform a scan of the local network and query the type of each device
+
+    The scan ends as soon as the expected number of devices answered or
+    no new device answered for quietPeriod seconds. The type is only
+    queried with the speedwire password of the devices.
+    """
+    discover = Discovery(asyncio.get_event_loop())
+    return await discover.runAdaptive(quietPeriod, expected, password, group)
@@ -0,0 +1,161 @@
+"""Keep-alive HTTP connections to a single device.
+
+The embedded web servers of SMA devices are slow to accept new (TLS)
+connections. A ConnectionPool reuses the connections to one device
+and counts, how often a connection could be reused.
+"""
+
+import logging
+import ssl
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Dict
+
+from aiohttp import (
+    ClientSession,
+    ClientTimeout,
+    TCPConnector,
+    TraceConfig,
+    TraceConnectionCreateEndParams,
+    TraceConnectionReuseconnParams,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class ConnectionStatistics:
+    """Statistics of the requests to a device"""
+
+    requests: int = 0
+    # Connections only counted if the pool uses its own connector
+    newConnections: int = 0
+    reusedConnections: int = 0
+
+
+class ConnectionPool:
+    """HTTP connections to one device.
+
+    By default the requests use the ClientSession of the caller. With the
+    option keepAlive the pool uses an own session with a connector tuned
+    for the device.
+
+    Options:
+        keepAlive: use an own connector with keep-alive connections
+        keepAliveTimeout: seconds an idle connection is kept open
+        limitPerHost: maximum number of connections to the device
+        dnsCacheTtl: seconds a resolved hostname is cached
+        verifySsl: verify the certificate of the device. By default the
+            setting of the connector of the caller is used, as most
+            devices use self-signed certificates.
+    """
+
+    OPTIONS = [
+        "keepAlive",
+        "keepAliveTimeout",
+        "limitPerHost",
+        "dnsCacheTtl",
+        "verifySsl",
+    ]
+
+    def __init__(self, session: ClientSession, timeout: float) -> None:
+        """Init the pool
+
+        Args:
+            session: ClientSession of the caller
+            timeout: total timeout of each request in seconds
+        """
+        self._callerSession = session
+        self._session: ClientSession | None = None
+        self._timeout = ClientTimeout(total=timeout)
+        self._keepAlive = False
+        self._keepAliveTimeout = 30.0
+        self._limitPerHost = 2
+        self._dnsCacheTtl = 300
+        self._verifySsl: bool | None = None
+        self._sslContext: ssl.SSLContext | None = None
+        self.statistics = ConnectionStatistics()
+
+    def set_options(self, options: Dict[str, Any]) -> None:
+        """Set the options of the pool, unknown options are ignored.
+
+        A changed configuration takes effect with the next session.
+        """
+        for key, value in options.items():
+            if key == "keepAlive":
+                self._keepAlive = str(value).lower() in ["1", "true", "yes"]
+            elif key == "keepAliveTimeout":
+                self._keepAliveTimeout = float(value)
+            elif key == "limitPerHost":
+                self._limitPerHost = int(value)
+            elif key == "dnsCacheTtl":
+                self._dnsCacheTtl = int(value)
+            elif key == "verifySsl":
+                self._verifySsl = str(value).lower() in ["1", "true", "yes"]
+                self._sslContext = None
+
+    def request(self, method: str, url: str, **kwargs: Any) -> Any:
+        """Start a request, to be used with "async with"."""
+        self.statistics.requests += 1
+        return self._getSession().request(method, url, timeout=self._timeout, **kwargs)
+
+    async def close(self) -> None:
+        """Close the own connections, the session of the caller is kept open."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _getSession(self) -> ClientSession:
+        if not self._keepAlive:
+            return self._callerSession
+        if self._session is None or self._session.closed:
+            connector = TCPConnector(
+                keepalive_timeout=self._keepAliveTimeout,
+                limit_per_host=self._limitPerHost,
+                ttl_dns_cache=self._dnsCacheTtl,
+                ssl=self._getSsl(),
+            )
+            trace = TraceConfig()
+            trace.on_connection_create_end.append(self._on_connection_create)
+            trace.on_connection_reuseconn.append(self._on_connection_reuse)
+            self._session = ClientSession(
+                connector=connector, timeout=self._timeout, trace_configs=[trace]
+            )
+        return self._session
+
+    def _getSsl(self) -> Any:
+        """SSL setting of the own connector"""
+        verify = self._verifySsl
+        if verify is None:
+            # Same as the connector of the caller, e.g. TCPConnector(ssl=False)
+            callerSsl = getattr(self._callerSession.connector, "_ssl", True)
+            if not isinstance(callerSsl, bool):
+                # SSLContext or Fingerprint of the caller
+                return callerSsl
+            verify = callerSsl
+        return self._getSslContext(verify)
+
+    def _getSslContext(self, verify: bool) -> ssl.SSLContext:
+        """One TLS context for all connections, so TLS sessions can be reused."""
+        if self._sslContext is None:
+            self._sslContext = ssl.create_default_context()
+            if not verify:
+                self._sslContext.check_hostname = False
+                self._sslContext.verify_mode = ssl.CERT_NONE
+        return self._sslContext
+
+    async def _on_connection_create(
+        self,
+        session: ClientSession,
+        ctx: SimpleNamespace,
+        params: TraceConnectionCreateEndParams,
+    ) -> None:
+        self.statistics.newConnections += 1
+
+    async def _on_connection_reuse(
+        self,
+        session: ClientSession,
+        ctx: SimpleNamespace,
+        params: TraceConnectionReuseconnParams,
+    ) -> None:
+        self.statistics.reusedConnections += 1
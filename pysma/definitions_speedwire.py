@@ -938,6 +938,43 @@ commands: Dict[str, Dict[str, Any]] = {
 }
 
 
+def _commandForCode(code: str, cmd: str) -> str | None:
+    """Return the command whose register range contains the response code.
+
+    The cmd of the response definition is not always the command that
+    returns the code, so the register ranges are checked. If several ranges
+    match, the narrowest (and first defined) one is used."""
+    base = int(code, 16) & 0x00FFFF00
+    candidates = [
+        name
+        for name, c in commands.items()
+        if "first" in c
+        and name != "login"
+        and (c["first"] & 0x00FFFFFF) <= base <= (c["last"] & 0x00FFFFFF)
+    ]
+    if not candidates:
+        return cmd if cmd in commands else None
+    # min() returns the first of equally narrow ranges
+    return min(candidates, key=lambda n: commands[n]["last"] - commands[n]["first"])
+
+
+def _buildSensorKey2command() -> Dict[str, str]:
+    """Reverse index: Sensor.key => name of the command that returns the sensor"""
+    index: Dict[str, str] = {}
+    for code, handlers in responseDef.items():
+        for handler in handlers:
+            sensors = handler.get("sensor")
+            cmd = _commandForCode(code, handler.get("cmd", ""))
+            if sensors is None or cmd is None:
+                continue
+            for sensor in sensors if isinstance(sensors, list) else [sensors]:
+                index[sensor.key] = cmd
+    return index
+
+
+sensorKey2command = _buildSensorKey2command()
+
+
 @dcs.dataclass(dcs.BIG_ENDIAN)
 class speedwireHeader:
     """Speedwire header"""
@@ -1215,13 +1252,16 @@ class SpeedwireFrame:
 
         return bytes(frame_header) + bytes(frame_data_header) + bytes(frame_data)
 
-    def getQueryFrame(self, serial: int, command_name: str) -> bytes:
-        """Return Query Frame"""
+    def getQueryFrame(
+        self, serial: int, command_name: str, command: Dict[str, Any] | None = None
+    ) -> bytes:
+        """Return Query Frame. command overrides the definition of command_name."""
         frame_header = self.getFrameHeader()
         frame_data_header = self.getDataHeader(serial)
         frame_data = self.QueryFrame()
 
-        command = commands[command_name]
+        if command is None:
+            command = commands[command_name]
 
         frame_header.ctrl = 0xA0
         frame_data_header.dst_sysyid = 0xFFFF
@@ -1247,6 +1287,14 @@ class SpeedwireFrame:
 
         return bytes(frame_header) + bytes(frame_data_header) + bytes(frame_data)
 
+    @staticmethod
+    def getPacketId(frame: bytes) -> int:
+        """Return the packet id of a frame without the request flag (0x8000).
+
+        The data header of a request is laid out like speedwireHeader6065,
+        the response carries the same packet id."""
+        return speedwireHeader6065.from_packed(frame[18 : 18 + 36]).pktId & 0x7FFF
+
     def getFrameHeader(self) -> FrameHeader:
         """Return Frame Header"""
         newFrameHeader = self.FrameHeader()
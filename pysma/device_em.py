@@ -7,13 +7,15 @@ see https://cdn.sma.de/fileadmin/content/www.developer.sma.de/docs/EMETER-Protok
 
 import asyncio
 import base64
+import collections
 import copy
 import logging
 import socket
 import struct
 import time
+from asyncio import DatagramProtocol
 from dataclasses import dataclass, field
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, Iterable, List
 
 from .const import SMATagList
 from .definitions_em import obis2sensor
@@ -24,32 +26,328 @@ from .sensor import Sensor, Sensors
 
 _LOGGER = logging.getLogger(__name__)
 
+# OBIS channel header: channel, index, type and tariff
+_OBIS_HEADER_STRUCT = struct.Struct(">L")
+# OBIS values: 4 bytes for actual values, 8 bytes for counters
+_OBIS_VALUE_STRUCTS = {4: struct.Struct(">L"), 8: struct.Struct(">Q")}
+# Channel of the software version
+_OBIS_CHANNEL_VERSION = 144
+
+
+def _obisKey(obis: str) -> int:
+    """Pack an OBIS key "index:type:tariff" like the channel header"""
+    mvalueindex, mtyp, mtariff = (int(x) for x in obis.split(":"))
+    return (mvalueindex << 16) | (mtyp << 8) | mtariff
+
+
+# Packed OBIS key => (sensor key, factor)
+obisChannels: Dict[int, tuple[str, int | None]] = {
+    _obisKey(s.key): (s.key, s.factor) for s in obis2sensor
+}
+
 
 @dataclass
 class Debug_information_em:
     """Struct to store debug Information"""
 
     serial: set[int] = field(default_factory=set)
-    protocol: set[str] = field(default_factory=lambda: set())
+    protocol: set[int] = field(default_factory=lambda: set())
     last_packet_metadata: tuple[str, int, int] | None = None
     last_packet: bytes | None = None
     last_data: dict[str, Any] | None = None
     last_valid_packet: bytes | None = None
 
 
+def _obisName(header: int) -> str:
+    """OBIS key "index:type:tariff" of a channel header"""
+    return f"{(header >> 16) & 0xFF}:{(header >> 8) & 0xFF}:{header & 0xFF}"
+
+
+@dataclass
+class EMPacket:
+    """Speedwire packet received on the multicast group"""
+
+    protocol: int
+    metadata: tuple[str, int, int] | None = None
+    # Decoded values, None if the packet is no new 6069 packet
+    data: dict[str, Any] | None = None
+
+
+def decodePacket(
+    p: bytes,
+    addr: tuple[str, int],
+    lastMetadata: tuple[str, int, int] | None = None,
+) -> EMPacket:
+    """Decode a Speedwire-Packet
+
+    Args:
+        p: Network-Packet
+        addr: Sender of the packet
+        lastMetadata: Metadata of the previous packet, a repeated packet is not decoded
+
+    Returns:
+        EMPacket: protocol, metadata and the decoded values
+    """
+    view = memoryview(p)
+    sw = speedwireHeader.from_packed(view[0:18])
+    packet = EMPacket(sw.protokoll)
+    if not sw.check6069():
+        return packet
+    sw6069 = speedwireHeader6069.from_packed(view[18:28])
+    packet.metadata = (addr[0], addr[1], sw6069.timestamp)
+    if lastMetadata == packet.metadata:
+        return packet
+    data: dict[str, Any] = {}
+    data["protocolID"] = sw.protokoll
+    data["susyid"] = sw6069.src_susyid
+    data["device"] = SMATagList.get(data["susyid"], "unknown")
+    data["serial"] = sw6069.src_serial
+    data["ip"] = addr[0] + ":" + str(addr[1])
+    length = sw.smanet2_length + 16
+    pos = 28
+    while pos < length:
+        (header,) = _OBIS_HEADER_STRUCT.unpack_from(p, pos)
+        mtyp = (header >> 8) & 0xFF
+        valueStruct = _OBIS_VALUE_STRUCTS.get(mtyp)
+        if valueStruct is not None:
+            # 4 actucal / current => 8 Bytes
+            # 8 counter / sum => 12 Bytes
+            (value,) = valueStruct.unpack_from(p, pos + 4)
+            pos += 4 + mtyp
+            channel = obisChannels.get(header & 0xFFFFFF)
+            if channel is None:
+                data[_obisName(header)] = value
+                continue
+            key, factor = channel
+            data[key] = value / factor if factor else value
+        elif header >> 24 == _OBIS_CHANNEL_VERSION and mtyp == 0:
+            data["sw_version"] = (
+                f"{p[pos + 4]}.{p[pos + 5]}.{p[pos + 6]}.{chr(p[pos + 7])}"
+            )
+            pos += 4 + 4
+        else:
+            _LOGGER.debug(
+                "Unknown packet in speedwire: %d %d %d %d",
+                header >> 24,
+                (header >> 16) & 0xFF,
+                mtyp,
+                header & 0xFF,
+            )
+            data[_obisName(header)] = None
+            pos += 4 + 4
+    packet.data = data
+    return packet
+
+
+@dataclass
+class EMFrame:
+    """Decoded values of one energy meter packet"""
+
+    serial: int
+    susyid: int
+    device: str
+    ip: str
+    # time.monotonic() of the reception
+    received: float
+    # Values by OBIS key, already scaled
+    values: dict[str, Any]
+
+    @classmethod
+    def fromData(cls, data: dict[str, Any], received: float) -> "EMFrame":
+        """Create a frame from the decoded packet"""
+        return cls(
+            data["serial"], data["susyid"], data["device"], data["ip"], received, data
+        )
+
+
+class _FrameStream:
+    """Buffer of a stream between the listener and the consumer.
+
+    A full buffer drops the oldest frame. With coalesce only
+    the latest frame of each serial is kept."""
+
+    def __init__(
+        self, serials: Iterable[str | int] | None, maxsize: int, coalesce: bool
+    ) -> None:
+        self.serials = None if serials is None else {str(s) for s in serials}
+        self.coalesce = coalesce
+        self.frames: collections.deque[EMFrame] = collections.deque(maxlen=maxsize)
+        self.latest: Dict[int, EMFrame] = {}
+        self.dropped = 0
+        self.event = asyncio.Event()
+
+    def put(self, frame: EMFrame) -> None:
+        """Add a frame, called for each packet"""
+        if self.serials is not None and str(frame.serial) not in self.serials:
+            return
+        if self.coalesce:
+            if self.latest.pop(frame.serial, None) is not None:
+                self.dropped += 1
+            self.latest[frame.serial] = frame
+        else:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(frame)
+        self.event.set()
+
+    async def get(self) -> EMFrame:
+        """Wait for the next frame"""
+        while not self.frames and not self.latest:
+            self.event.clear()
+            await self.event.wait()
+        if self.coalesce:
+            return self.latest.pop(next(iter(self.latest)))
+        return self.frames.popleft()
+
+
+class SpeedwireMulticastListener(DatagramProtocol):
+    """Process-wide listener for the speedwire multicast group.
+
+    All energy meters share one socket. Each datagram is decoded once
+    and passed to all subscribers."""
+
+    MULTICAST_GROUP = "239.12.255.254"
+    PORT = 9522
+
+    _instance: "SpeedwireMulticastListener | None" = None
+
+    def __init__(self) -> None:
+        """init"""
+        self._loop = asyncio.get_running_loop()
+        self._subscribers: List[Any] = []
+        self._joined: set[Any] = set()
+        self._lastMetadata: tuple[str, int, int] | None = None
+        self._transport: asyncio.DatagramTransport | None = None
+        self._ready: asyncio.Future = self._loop.create_future()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.setsockopt(
+            socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, struct.pack("@i", 1)
+        )
+        self._sock.bind(("", self.PORT))
+
+    @classmethod
+    async def attach(
+        cls, subscriber: Any, bindingAddr: List[Any] | None = None
+    ) -> "SpeedwireMulticastListener":
+        """Subscribe to the multicast packets.
+
+        The subscriber must implement _handle_packet(p, addr, packet).
+        The socket is opened by the first subscriber."""
+        listener = cls._instance
+        if listener is None or listener._loop is not asyncio.get_running_loop():
+            listener = cls()
+            cls._instance = listener
+            try:
+                await listener._loop.create_datagram_endpoint(
+                    lambda: listener, sock=listener._sock
+                )
+                listener.join(bindingAddr or [])
+            except BaseException as exc:
+                # Concurrent subscribers get the exception, too
+                listener._ready.set_exception(exc)
+                listener._ready.exception()
+                listener.close()
+                raise
+            listener._ready.set_result(True)
+        else:
+            await asyncio.shield(listener._ready)
+            try:
+                listener.join(bindingAddr or [])
+            except RuntimeError:
+                if not listener._subscribers:
+                    listener.close()
+                raise
+        if subscriber not in listener._subscribers:
+            listener._subscribers.append(subscriber)
+        return listener
+
+    def detach(self, subscriber: Any) -> None:
+        """Unsubscribe, the socket is closed with the last subscriber"""
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+        if not self._subscribers:
+            self.close()
+
+    def close(self) -> None:
+        """Close the socket"""
+        if SpeedwireMulticastListener._instance is self:
+            SpeedwireMulticastListener._instance = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        else:
+            self._sock.close()
+
+    def join(self, bindingAddr: List[Any]) -> None:
+        """Join the multicast group on the interfaces, that are not joined yet"""
+        if len(bindingAddr) == 0:
+            bindingAddr = [socket.INADDR_ANY]
+        group = socket.inet_aton(self.MULTICAST_GROUP)
+        for addr in bindingAddr:
+            if addr in self._joined:
+                continue
+            if addr == socket.INADDR_ANY:
+                mreq = struct.pack("4sL", group, socket.INADDR_ANY)
+                self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+            else:
+                _LOGGER.info("Binding to %s", addr)
+                try:
+                    self._sock.setsockopt(
+                        socket.IPPROTO_IP,
+                        socket.IP_ADD_MEMBERSHIP,
+                        group + socket.inet_aton(addr),
+                    )
+                except BaseException as exc:
+                    raise RuntimeError(
+                        "Could not start multicast for %s. IP of the Interfaces must be used!"
+                        % addr
+                    ) from exc
+            self._joined.add(addr)
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Called if connection is made"""
+        self._transport = transport  # type: ignore[assignment]
+
+    def error_received(self, exc: Exception) -> None:
+        """Called by error."""
+        _LOGGER.error("%s error occurred: %s", type(exc), exc)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        """Called by connection lost."""
+        if SpeedwireMulticastListener._instance is self:
+            SpeedwireMulticastListener._instance = None
+
+    def datagram_received(self, p: bytes, addr: tuple[str, int]) -> None:
+        """Decode the packet once and pass it to all subscribers"""
+        try:
+            packet = decodePacket(p, addr, self._lastMetadata)
+        except struct.error:
+            _LOGGER.debug("Ignoring short packet from %s", addr)
+            return
+        if packet.data is not None:
+            self._lastMetadata = packet.metadata
+        for subscriber in list(self._subscribers):
+            subscriber._handle_packet(p, addr, packet)
+
+
 class SMAspeedwireEM(Device):
     """Class for the detection of SMA Devices in the local network."""
 
     def __init__(self) -> None:
         """init"""
         self.loop = asyncio.get_event_loop()
-        self._transport: asyncio.BaseTransport | None = None
-        self._protocol: SMAspeedwireEM | None = None
-        self.transport: asyncio.BaseTransport | None = None
-        self._data_received: asyncio.Future | None = None
+        self._listener: SpeedwireMulticastListener | None = None
+        # Waiting readers per serial, None waits for any device
+        self._waiters: Dict[str | None, List[asyncio.Future]] = {}
+        # Latest decoded values per serial with the time of reception
+        self._latest: Dict[str, tuple[float, dict[str, Any]]] = {}
+        # Maximum age in seconds of cached values used by read, 0 disables the cache
+        self._maxAge: float = 0
+        # Buffers of the running streams
+        self._streams: List[_FrameStream] = []
         self.di = Debug_information_em()
         self._device_list: Dict[str, DeviceInformation] = {}
-        self._expected_device: str | None = None
         self._bindingAddr: List[Any] = []
 
     # @override
@@ -68,11 +366,8 @@ class SMAspeedwireEM(Device):
 
     async def new_session(self) -> bool:
         """Starts a new session"""
-        sock = self._getDiscoverySocket()
-        on_connection_lost = self.loop.create_future()  # noqa F841
-        self._transport, self._protocol = await self.loop.create_datagram_endpoint(
-            lambda: self,  # type: ignore[type-var]
-            sock=sock,
+        self._listener = await SpeedwireMulticastListener.attach(
+            self, self._bindingAddr
         )
         data = None
         try:
@@ -86,14 +381,83 @@ class SMAspeedwireEM(Device):
     async def _get_next_values(
         self, deviceID: str | None = None, timeout: float = 2
     ) -> dict:
-        """Returns the next values received from the device."""
-        self._data_received = asyncio.get_running_loop().create_future()
-        self._expected_device = deviceID
-        await asyncio.wait_for(self._data_received, timeout=timeout)
-        data = self._data_received.result()
-        self._data_received = None
+        """Returns the next values received from the device.
+
+        Any number of readers can wait concurrently, for the same
+        or for different devices."""
+        fut = asyncio.get_running_loop().create_future()
+        waiters = self._waiters.setdefault(deviceID, [])
+        waiters.append(fut)
+        try:
+            return await asyncio.wait_for(fut, timeout=timeout)
+        finally:
+            waiters.remove(fut)
+            if not waiters:
+                self._waiters.pop(deviceID, None)
+
+    def _get_cached_values(self, deviceID: str | None = None) -> dict | None:
+        """Returns the latest values of the device if they are fresh enough."""
+        if self._maxAge <= 0:
+            return None
+        if deviceID is None:
+            if not self._latest:
+                return None
+            received, data = max(self._latest.values(), key=lambda x: x[0])
+        elif (latest := self._latest.get(deviceID)) is not None:
+            received, data = latest
+        else:
+            return None
+        if time.monotonic() - received > self._maxAge:
+            return None
         return data
 
+    def _publish(self, data: dict[str, Any]) -> None:
+        """Pass the decoded values to all readers waiting for this device."""
+        serial = str(data["serial"])
+        received = time.monotonic()
+        self._latest[serial] = (received, data)
+        for key in (serial, None):
+            for fut in self._waiters.get(key, ()):
+                if not fut.done():
+                    fut.set_result(data)
+        if self._streams:
+            frame = EMFrame.fromData(data, received)
+            for stream in self._streams:
+                stream.put(frame)
+
+    async def stream(
+        self,
+        serials: Iterable[str | int] | None = None,
+        maxsize: int = 16,
+        coalesce: bool = False,
+    ) -> AsyncIterator[EMFrame]:
+        """Yield the frames of the energy meters as they arrive.
+
+        Args:
+            serials: only frames of these devices, None for all devices
+            maxsize: number of buffered frames, the oldest frame is dropped first
+            coalesce: buffer only the latest frame of each device
+
+        Example:
+            async for frame in em.stream(serials=[3014930442]):
+                print(frame.values["1:4:0"])
+        """
+        attached = self._listener is None
+        if attached:
+            self._listener = await SpeedwireMulticastListener.attach(
+                self, self._bindingAddr
+            )
+        buffer = _FrameStream(serials, maxsize, coalesce)
+        self._streams.append(buffer)
+        try:
+            while True:
+                yield await buffer.get()
+        finally:
+            self._streams.remove(buffer)
+            if attached and self._listener is not None:
+                self._listener.detach(self)
+                self._listener = None
+
     # @override
     async def device_info(self) -> dict:
         """Read device info and return the results.
@@ -101,8 +465,6 @@ class SMAspeedwireEM(Device):
         Returns:
             dict: dict containing serial, name, type, manufacturer and sw_version
         """
-        #        await asyncio.wait_for(self._data_received, timeout=timeout)
-
         di = await self.device_list()
         return list(di.values())[0].asDict()
 
@@ -140,13 +502,13 @@ class SMAspeedwireEM(Device):
             bool: reading was successful
         """
         notfound = []
-        data = await self._get_next_values(deviceID)
+        data = self._get_cached_values(deviceID)
+        if data is None:
+            data = await self._get_next_values(deviceID)
         for sensor in sensors:
             if sensor.key in data:
-                value = data[sensor.key]
-                if sensor.factor:
-                    value /= sensor.factor
-                sensor.value = value
+                # values are already scaled by the decoder
+                sensor.value = data[sensor.key]
             else:
                 notfound.append(sensor.key)
 
@@ -161,9 +523,9 @@ class SMAspeedwireEM(Device):
     # @override
     async def close_session(self) -> None:
         """Closes the session"""
-        if self._transport:
-            self._transport.close()
-        self._sock.close()
+        if self._listener is not None:
+            self._listener.detach(self)
+            self._listener = None
 
     # @override
     async def detect(self, ip: str) -> List[DiscoveryInformation]:
@@ -215,7 +577,7 @@ class SMAspeedwireEM(Device):
             ),
             "last_data": self.di.last_data,
             "serial": list(self.di.serial),
-            "protocol": list(self.di.protocol),
+            "protocol": [f"{protocol:04x}" for protocol in self.di.protocol],
         }
         return debug_info
 
@@ -226,6 +588,8 @@ class SMAspeedwireEM(Device):
             if key.lower() == "bindingaddr":
                 addrs = str(item).split(",")
                 self._bindingAddr.extend(addrs)
+            elif key.lower() in ["maxage", "max_age"]:
+                self._maxAge = float(item)
 
     # @override
     async def set_parameter(
@@ -233,53 +597,6 @@ class SMAspeedwireEM(Device):
     ) -> None:
         """Set Parameters."""
 
-    def _getDiscoverySocket(self) -> socket.socket:
-        multicast_group = "239.12.255.254"
-        server_address = ("", 9522)
-
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind(server_address)
-        if len(self._bindingAddr) == 0:
-            self._bindingAddr = [socket.INADDR_ANY]
-            mreq = struct.pack(
-                "4sL", socket.inet_aton(multicast_group), socket.INADDR_ANY
-            )
-            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-        else:
-            _LOGGER.info("Binding to %s" % self._bindingAddr)
-            for addr in self._bindingAddr:
-                try:
-                    mreq = struct.pack(
-                        "4s4s",
-                        socket.inet_aton(multicast_group),
-                        socket.inet_aton(addr),
-                    )
-                    sock.setsockopt(
-                        socket.IPPROTO_IP,
-                        socket.IP_ADD_MEMBERSHIP,
-                        socket.inet_aton(multicast_group) + socket.inet_aton(addr),
-                    )
-                except BaseException as exc:
-                    raise RuntimeError(
-                        "Could not start multicast for %s. IP of the Interfaces must be used!"
-                        % addr
-                    ) from exc
-        self._sock = sock
-        return self._sock
-
-    def connection_made(self, transport: asyncio.BaseTransport) -> None:
-        """Called if connection is made"""
-        self.transport = transport
-
-    def error_received(self, exc: Exception) -> None:
-        """Called by error."""
-        _LOGGER.error("%s error occurred: %s", type(exc), exc)
-
-    def connection_lost(self, exc: Exception) -> None:
-        """Called by connection lost."""
-        # _LOGGER.error("Socket closed, stop the event loop %s %s", type(exc), exc)
-
     def datagram_received(self, p: bytes, addr: tuple[str, int]) -> dict[str, Any]:
         """Decode a Speedwire-Packet
 
@@ -289,61 +606,23 @@ class SMAspeedwireEM(Device):
         Returns:
             dict: Dict with all the decoded information
         """
+        packet = decodePacket(p, addr, self.di.last_packet_metadata)
+        return self._handle_packet(p, addr, packet)
+
+    def _handle_packet(
+        self, p: bytes, addr: tuple[str, int], packet: EMPacket
+    ) -> dict[str, Any]:
+        """Handle a decoded packet, called by the multicast listener"""
         self.di.last_packet = p
-        sw = speedwireHeader.from_packed(p[0:18])
-        self.di.protocol.add(f"{sw.protokoll:04x}")
-        if not sw.check6069():
+        self.di.protocol.add(packet.protocol)
+        data = packet.data
+        if data is None:
             return {}
-        sw6069 = speedwireHeader6069.from_packed(p[18:28])
-        m = (addr[0], addr[1], sw6069.timestamp)
-        if self.di.last_packet_metadata == m:
-            return {}
-        self.di.last_packet_metadata = m
-        data: dict[str, Any] = {}
-        data["protocolID"] = sw.protokoll
-        data["susyid"] = sw6069.src_susyid
-        data["device"] = SMATagList.get(data["susyid"], "unknown")
-        data["serial"] = sw6069.src_serial
-        data["ip"] = addr[0] + ":" + str(addr[1])
-        length = sw.smanet2_length + 16
-        pos = 28
-        while pos < length:
-            value: Any = None
-            mchannel = int.from_bytes(p[pos : pos + 1], byteorder="big")
-            mvalueindex = int.from_bytes(p[pos + 1 : pos + 2], byteorder="big")
-            mtyp = int.from_bytes(p[pos + 2 : pos + 3], byteorder="big")
-            mtariff = int.from_bytes(p[pos + 3 : pos + 4], byteorder="big")
-            obis = f"{mvalueindex}:{mtyp}:{mtariff}"
-            if mtyp in [4, 8]:
-                # 4 actucal / current => 8 Bytes
-                # 8 counter / sum => 12 Bytes
-                value = int.from_bytes(p[pos + 4 : pos + 4 + mtyp], byteorder="big")
-                pos += 4 + mtyp
-            elif mchannel == 144 and mtyp == 0:
-                value = f"{p[pos + 4]}.{p[pos + 5]}.{p[pos + 6]}.{chr(p[pos + 7])}"
-                obis = "sw_version"
-                pos += 4 + 4
-            else:
-                _LOGGER.debug(
-                    "Unknown packet in speedwire: "
-                    + str(mchannel)
-                    + " "
-                    + str(mvalueindex)
-                    + " "
-                    + str(mtyp)
-                    + " "
-                    + str(mtariff)
-                )
-                pos += 4 + 4
-            data[obis] = value
+        self.di.last_packet_metadata = packet.metadata
 
         # Statistics & Co
         self.di.serial.add(data["serial"])
         self.di.last_valid_packet = p
         self.di.last_data = data
-        if self._data_received is not None and not self._data_received.done():
-            if self._expected_device is None or self._expected_device == str(
-                data["serial"]
-            ):
-                self._data_received.set_result(data)
+        self._publish(data)
         return data
@@ -7,12 +7,14 @@ import asyncio
 import copy
 import json
 import logging
+import time
 from dataclasses import asdict, dataclass, field
 from datetime import UTC, datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
-from aiohttp import ClientSession, ClientTimeout, client_exceptions, hdrs
+from aiohttp import ClientSession, client_exceptions, hdrs
 
+from .connection_pool import ConnectionPool
 from .const import SMATagList
 from .definitions_ennexos import DEFAULT_TIMEOUT, getSensorForDevice
 from .device import Device, DeviceInformation, DiscoveryInformation
@@ -51,6 +53,12 @@ class SMAennexos(Device):
     _authorization_header: dict[str, str]
     _componentId = "IGULD:SELF"
     _device_list: Dict[str, DeviceInformation] = {}
+    # Maximum number of concurrent requests to the device
+    _maxConcurrency = 4
+    # Seconds until the parameters are requested again, 0 requests them on each read
+    _parameterInterval: float = 0
+    # Seconds until all measurements are requested again, if a sensor has no channel
+    _liveChannelInterval: float = 300
 
     def __init__(
         self,
@@ -75,6 +83,17 @@ class SMAennexos(Device):
         _LOGGER.debug(f"Ennexos {url} => {self._url}")
         self._new_session_data = {"user": group, "pass": password}
         self._aio_session = session
+        self._pool = ConnectionPool(session, DEFAULT_TIMEOUT)
+        self._requestLimit = asyncio.Semaphore(self._maxConcurrency)
+        self._refreshToken: str | None = None
+        # time.monotonic() when the token expires, None if unknown
+        self._tokenExpires: float | None = None
+        self._tokenRefreshTask: asyncio.Task | None = None
+        # Measurement channelIds per componentId, by name without prefix,
+        # with the time.monotonic() of the request
+        self._liveChannels: Dict[str, tuple[float, Dict[str, str]]] = {}
+        # Parameters per componentId with the time.monotonic() of the request
+        self._parameterCache: Dict[str, tuple[float, Dict[str, Dict[str, Any]]]] = {}
 
     async def _jsonrequest(
         self, url: str, parameters: Dict[str, Any], method: str = hdrs.METH_POST
@@ -94,9 +113,10 @@ class SMAennexos(Device):
             dict: json returned by device
         """
         try:
-            async with self._aio_session.request(
-                method, url, timeout=ClientTimeout(total=DEFAULT_TIMEOUT), **parameters
-            ) as res:
+            async with (
+                self._requestLimit,
+                self._pool.request(method, url, **parameters) as res,
+            ):
                 _LOGGER.debug(f"Request {url} Code {res.status}")
                 if res.status == 200:
                     resjson = await res.json()
@@ -145,24 +165,7 @@ class SMAennexos(Device):
         if self._new_session_data is None:
             _LOGGER.error("User & Pwd not set!")
             return False
-        _LOGGER.debug(f'Trying to login {self._url} {self._new_session_data["user"]}')
-        loginurl = self._url + "/api/v1/token"
-        postdata = {
-            "data": {
-                "grant_type": "password",
-                "username": self._new_session_data["user"],
-                "password": self._new_session_data["pass"],
-            }
-        }
-        ret = await self._jsonrequest(loginurl, postdata)
-        if "access_token" not in ret:
-            _LOGGER.debug(f"Login failed {ret}")
-            raise SmaAuthenticationException("Login failed!")
-        self._authorization_header = {
-            "Authorization": "Bearer " + ret["access_token"],
-            "Content-Type": "application/json",
-        }
-        _LOGGER.debug("Login successful")
+        await self._login()
 
         for u in [
             "/api/v1/plants/Plant:1",
@@ -190,22 +193,154 @@ class SMAennexos(Device):
 
         return True
 
+    async def _login(self) -> None:
+        """Request a new token with username and password."""
+        assert self._new_session_data is not None
+        _LOGGER.debug(f'Trying to login {self._url} {self._new_session_data["user"]}')
+        postdata = {
+            "data": {
+                "grant_type": "password",
+                "username": self._new_session_data["user"],
+                "password": self._new_session_data["pass"],
+            }
+        }
+        ret = await self._jsonrequest(self._url + "/api/v1/token", postdata)
+        if "access_token" not in ret:
+            _LOGGER.debug(f"Login failed {ret}")
+            raise SmaAuthenticationException("Login failed!")
+        self._set_token(ret)
+        _LOGGER.debug("Login successful")
+
+    async def _refresh_token(self) -> None:
+        """Renew the token with the refresh token.
+
+        Falls back to a login if the device does not accept the refresh token."""
+        if self._refreshToken is None:
+            await self._login()
+            return
+        postdata = {
+            "data": {
+                "grant_type": "refresh_token",
+                "refresh_token": self._refreshToken,
+            }
+        }
+        try:
+            ret = await self._jsonrequest(self._url + "/api/v1/token", postdata)
+        except SmaAuthenticationException:
+            ret = {}
+        if "access_token" not in ret:
+            _LOGGER.debug("Refreshing the token failed, login again")
+            await self._login()
+            return
+        self._set_token(ret)
+        _LOGGER.debug("Token refreshed")
+
+    def _set_token(self, ret: Dict[str, Any]) -> None:
+        """Use the token and schedule its refresh before it expires."""
+        self._authorization_header = {
+            "Authorization": "Bearer " + ret["access_token"],
+            "Content-Type": "application/json",
+        }
+        self._refreshToken = ret.get("refresh_token")
+        self._tokenExpires = None
+        if self._tokenRefreshTask is not None:
+            if self._tokenRefreshTask is not asyncio.current_task():
+                self._tokenRefreshTask.cancel()
+            self._tokenRefreshTask = None
+        if "expires_in" not in ret:
+            return
+        lifetime = float(ret["expires_in"])
+        self._tokenExpires = time.monotonic() + lifetime
+        # Refresh the token shortly before it expires
+        delay = max(1.0, lifetime - min(60.0, lifetime / 5))
+        self._tokenRefreshTask = asyncio.get_running_loop().create_task(
+            self._token_refresher(delay)
+        )
+
+    async def _token_refresher(self, delay: float) -> None:
+        """Background task to refresh the token."""
+        await asyncio.sleep(delay)
+        try:
+            await self._refresh_token()
+        except (SmaAuthenticationException, SmaConnectionException) as exc:
+            # The next read will login again
+            _LOGGER.warning("Could not refresh the token: %s", exc)
+
+    async def _ensure_token(self) -> None:
+        """Renew the token, if it already expired (e.g. the refresh was delayed)."""
+        if self._tokenExpires is not None and time.monotonic() >= self._tokenExpires:
+            await self._refresh_token()
+
     async def _get_parameter(self, componentId: str) -> Dict[str, Dict[str, Any]]:
         """Get all parameters from the device.
 
         Returns:
             Dict: Return a dict with all parameters
 
+        """
+        return (await self._get_parameter_many([componentId]))[componentId]
+
+    async def _get_parameter_many(
+        self, componentIds: List[str]
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Get all parameters from several devices with one request.
+
+        Returns:
+            Dict: Return a dict with all parameters for each componentId
+
         """
         liveurl = self._url + "/api/v1/parameters/search"
         postdata = {
-            "data": '{"queryItems":[{"componentId":"' + componentId + '"}]}',
+            "data": json.dumps(
+                {"queryItems": [{"componentId": c} for c in componentIds]},
+                separators=(",", ":"),
+            ),
             "headers": self._authorization_header,
         }
         ret = await self._jsonrequest(liveurl, postdata)
-        data = await self._prepare_parameter(ret, componentId)
+        if len(componentIds) == 1:
+            grouped = {componentIds[0]: ret}
+        else:
+            grouped = {c: [] for c in componentIds}
+            for r in ret:
+                grouped.setdefault(r.get("componentId"), []).append(r)
+        data = {c: await self._prepare_parameter(grouped[c], c) for c in componentIds}
+        now = time.monotonic()
+        for c, parameters in data.items():
+            self._parameterCache[c] = (now, parameters)
         return data
 
+    async def _get_parameter_cached(
+        self, componentIds: List[str]
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Get the parameters, only outdated ones are requested from the device.
+
+        Returns:
+            Dict: Return a dict with all parameters for each componentId
+
+        """
+        now = time.monotonic()
+        outdated = [
+            c
+            for c in componentIds
+            if c not in self._parameterCache
+            or now - self._parameterCache[c][0] >= self._parameterInterval
+        ]
+        if outdated:
+            await self._get_parameter_many(outdated)
+        return {c: self._parameterCache[c][1] for c in componentIds}
+
+    def invalidate_parameters(self, componentId: str | None = None) -> None:
+        """Request the parameters again on the next read.
+
+        Args:
+            componentId: Device to invalidate, None for all devices
+        """
+        if componentId is None:
+            self._parameterCache.clear()
+        else:
+            self._parameterCache.pop(componentId, None)
+
     async def _prepare_parameter(
         self, ret: Any, componentId: str
     ) -> Dict[str, Dict[str, Any]]:
@@ -255,9 +390,23 @@ class SMAennexos(Device):
         return data
 
     async def _get_all_readings(self, deviceID: str) -> Dict[str, Dict[str, Any]]:
-        readings = await self._get_livedata(deviceID)
-        readings.update(await self._get_parameter(deviceID))
-        return readings
+        return (await self._get_all_readings_many([deviceID]))[deviceID]
+
+    async def _get_all_readings_many(
+        self, deviceIDs: List[str], sensors: Dict[str, Sensors] | None = None
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Get measurements and parameters of several devices.
+
+        Both requests are sent concurrently and cover all devices.
+        Parameters are only requested if the cached ones are outdated.
+        With sensors, only their measurements are requested."""
+        live, parameters = await asyncio.gather(
+            self._get_livedata_many(deviceIDs, sensors),
+            self._get_parameter_cached(deviceIDs),
+        )
+        for deviceID, readings in live.items():
+            readings.update(parameters[deviceID])
+        return live
 
     async def _get_livedata(self, componentId: str) -> Dict[str, Dict[str, Any]]:
         """Get the sensors reading from the device.
@@ -266,14 +415,84 @@ class SMAennexos(Device):
             Dict: Return a dict with all measurements
 
         """
-        liveurl = self._url + "/api/v1/measurements/live"
-        postdata = {
-            "data": '[{"componentId":"' + componentId + '"}]',
-            "headers": self._authorization_header,
-        }
-        ret = await self._jsonrequest(liveurl, postdata)
-        out = await self._prepare_livedata(ret, componentId)
-        return out
+        return (await self._get_livedata_many([componentId]))[componentId]
+
+    async def _get_livedata_many(
+        self, componentIds: List[str], sensors: Dict[str, Sensors] | None = None
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Get the sensors reading from several devices with one request.
+
+        Devices without sensors or with unknown channels are requested
+        completely, otherwise only the channels of the enabled sensors.
+
+        Returns:
+            Dict: Return a dict with all measurements for each componentId
+
+        """
+        query: List[Dict[str, str]] = []
+        complete: List[str] = []
+        for c in componentIds:
+            channels = self._live_channels(c, sensors.get(c) if sensors else None)
+            if channels is None:
+                query.append({"componentId": c})
+                complete.append(c)
+            else:
+                query.extend({"componentId": c, "channelId": ch} for ch in channels)
+        ret: Any = []
+        if query:
+            liveurl = self._url + "/api/v1/measurements/live"
+            postdata = {
+                "data": json.dumps(query, separators=(",", ":")),
+                "headers": self._authorization_header,
+            }
+            ret = await self._jsonrequest(liveurl, postdata)
+        if len(componentIds) == 1:
+            grouped = {componentIds[0]: ret}
+        else:
+            grouped = {c: [] for c in componentIds}
+            for r in ret:
+                grouped.setdefault(r.get("componentId"), []).append(r)
+        for c in complete:
+            if not grouped[c]:
+                continue
+            # Remember the channels of the device for the next requests
+            learned: Dict[str, str] = {}
+            for r in grouped[c]:
+                name = r["channelId"].replace("Measurement.", "").replace("[]", "")
+                learned[name] = r["channelId"]
+            self._liveChannels[c] = (time.monotonic(), learned)
+        return {c: await self._prepare_livedata(grouped[c], c) for c in componentIds}
+
+    def _live_channels(self, componentId: str, sensors: Sensors | None) -> list | None:
+        """Return the channelIds of the enabled sensors.
+
+        Returns None, if all channels have to be requested. Channels can
+        appear later (e.g. PV at night or while the device starts up), so
+        all channels are requested again after _liveChannelInterval, if an
+        enabled sensor is neither a known channel nor a parameter."""
+        entry = self._liveChannels.get(componentId)
+        if sensors is None or entry is None:
+            return None
+        learned, channels = entry
+        parameters = self._parameterCache.get(componentId, (0, {}))[1]
+        wanted: List[str] = []
+        missing = False
+        for sen in sensors:
+            if not sen.enabled:
+                continue
+            channelId = channels.get(sen.key)
+            if channelId is None:
+                # Value-Arrays are split into name.1, name.2, ...
+                name, _, idx = sen.key.rpartition(".")
+                if idx.isdigit():
+                    channelId = channels.get(name)
+            if channelId is None:
+                missing = missing or sen.key not in parameters
+            elif channelId not in wanted:
+                wanted.append(channelId)
+        if missing and time.monotonic() - learned >= self._liveChannelInterval:
+            return None
+        return wanted
 
     async def _prepare_livedata(
         self, ret: Any, componentId: str
@@ -347,6 +566,10 @@ class SMAennexos(Device):
 
     async def close_session(self) -> None:
         """Closes the session."""
+        if self._tokenRefreshTask is not None:
+            self._tokenRefreshTask.cancel()
+            self._tokenRefreshTask = None
+        await self._pool.close()
 
     def _isfloat(self, num: Any) -> bool:
         """Test if num is a float.
@@ -388,16 +611,41 @@ class SMAennexos(Device):
         Returns:
             bool: reading was successful
         """
-        notfound = []
         deviceID = self.deviceIDFallback(deviceID)
-        data = None
+        return await self.read_many({deviceID: sensors})
+
+    async def read_many(self, sensors: Dict[str, Sensors]) -> bool:
+        """Read the sensors of several devices.
+
+        The measurements and parameters of all devices are requested
+        with one request each. Once the channels of a device are known
+        (after get_sensors or the first read), only the measurements
+        of the enabled sensors are requested.
+
+        Args:
+            sensors (Dict[str, Sensors]): Sensors to read for each deviceID
+
+        Returns:
+            bool: reading was successful
+        """
+        deviceIDs = list(sensors.keys())
+        await self._ensure_token()
         try:
-            data = await self._get_all_readings(deviceID)
+            data = await self._get_all_readings_many(deviceIDs, sensors)
         except SmaAuthenticationException:
-            # Relogin
-            _LOGGER.debug("Re-login .. Starting new Session")
-            await self.new_session()
-            data = await self._get_all_readings(deviceID)
+            # Renew the token, the plant information is still valid
+            _LOGGER.debug("Re-login .. Renewing the token")
+            await self._refresh_token()
+            data = await self._get_all_readings_many(deviceIDs, sensors)
+        for deviceID, deviceSensors in sensors.items():
+            self._set_values(deviceSensors, data[deviceID], deviceID)
+        return True
+
+    def _set_values(
+        self, sensors: Sensors, data: Dict[str, Dict[str, Any]], deviceID: str
+    ) -> None:
+        """Set the values of the sensors from the readings of the device."""
+        notfound = []
         for sen in sensors:
             if sen.enabled:
                 if sen.key in data:
@@ -422,7 +670,6 @@ class SMAennexos(Device):
                 ",".join(notfound),
             )
             self._debug.last_notfound[deviceID].extend(notfound)
-        return True
 
     # @override
     async def device_info(self) -> dict:
@@ -449,8 +696,9 @@ class SMAennexos(Device):
         for d in devices:
             deviceID.add(d["deviceId"])
         self._device_list = {}
-        for d in deviceID:
-            di = await self._device_info_by_componentId(d)
+        for di in await asyncio.gather(
+            *(self._device_info_by_componentId(d) for d in deviceID)
+        ):
             if di:
                 self._device_list[di.id] = di
 
@@ -482,9 +730,10 @@ class SMAennexos(Device):
             devInfo["vendor"],
             devInfo.get("firmwareVersion", "0.0"),
         )
-        para = await self._get_parameter(componentId)
+        para, data = await asyncio.gather(
+            self._get_parameter(componentId), self._get_livedata(componentId)
+        )
         di.parameterCount = len(para)
-        data = await self._get_livedata(componentId)
         di.measurementsCount = len(data)
         for key, value in devInfo.items():
             if key in [
@@ -506,6 +755,7 @@ class SMAennexos(Device):
         """Returns all Debug Information."""
         x = asdict(self._debug)
         x["device_list"] = self._device_list
+        x["connections"] = asdict(self._pool.statistics)
         return x
 
     # @override
@@ -541,6 +791,15 @@ class SMAennexos(Device):
             if key == "componentId":
                 print(f"Option {key}: {self._componentId} => {value}")
                 self._componentId = value
+            elif key in ConnectionPool.OPTIONS:
+                self._pool.set_options({key: value})
+            elif key == "parameterInterval":
+                self._parameterInterval = float(value)
+            elif key == "liveChannelInterval":
+                self._liveChannelInterval = float(value)
+            elif key == "maxConcurrency":
+                self._maxConcurrency = max(1, int(value))
+                self._requestLimit = asyncio.Semaphore(self._maxConcurrency)
             else:
                 _LOGGER.error("Unknown Options: %s %s", key, value)
 
@@ -567,4 +826,7 @@ class SMAennexos(Device):
             "headers": self._authorization_header,
         }
         url = self._url + "/api/v1/parameters/" + deviceID
-        dev = await self._jsonrequest(url, putdata, hdrs.METH_PUT)  # noqa: F841
+        try:
+            dev = await self._jsonrequest(url, putdata, hdrs.METH_PUT)  # noqa: F841
+        finally:
+            self.invalidate_parameters(deviceID)
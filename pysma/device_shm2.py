@@ -1,8 +1,10 @@
 import asyncio
 import copy
 import logging
+import struct
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple
 
 from pymodbus.client import AsyncModbusTcpClient
 from pymodbus.exceptions import ModbusException
@@ -119,6 +121,64 @@ modusbus2sensorList: List[modusbus2sensor] = [
 ]
 modbusDict = {i.sensor.key: i for i in modusbus2sensorList}
 
+# Unpackers of the value formats, registers are big endian
+REGISTER_FORMATS: Dict[str, struct.Struct] = {
+    "u32": struct.Struct(">L"),
+    "s32": struct.Struct(">l"),
+}
+_DEVICE_VENDOR_STRUCT = struct.Struct(">LL")
+
+# Maximum number of registers read with one request (Modbus limit is 125)
+MAX_BLOCK_REGISTERS = 120
+
+
+@lru_cache
+def _blockStruct(count: int) -> struct.Struct:
+    """Struct to pack count registers to bytes"""
+    return struct.Struct(f">{count}H")
+
+
+@dataclass
+class modbusBlock:
+    """Contiguous registers of one slave, read with one request"""
+
+    slaveid: int
+    addr: int
+    count: int
+    entries: List[modusbus2sensor]
+
+
+def planModbusBlocks(
+    sensorDefs: Iterable[modusbus2sensor], maxCount: int = MAX_BLOCK_REGISTERS
+) -> List[modbusBlock]:
+    """Group the sensor definitions to contiguous blocks per slave id"""
+    blocks: List[modbusBlock] = []
+    for sensorDef in sorted(sensorDefs, key=lambda d: (d.slaveid, d.addr)):
+        count = REGISTER_FORMATS[sensorDef.valueFormat].size // 2
+        end = sensorDef.addr + count
+        last = blocks[-1] if blocks else None
+        if (
+            last is not None
+            and last.slaveid == sensorDef.slaveid
+            and sensorDef.addr <= last.addr + last.count
+            and end - last.addr <= maxCount
+        ):
+            last.count = max(last.count, end - last.addr)
+            last.entries.append(sensorDef)
+        else:
+            blocks.append(
+                modbusBlock(sensorDef.slaveid, sensorDef.addr, count, [sensorDef])
+            )
+    return blocks
+
+
+@lru_cache(maxsize=16)
+def _planForKeys(keys: Tuple[str, ...]) -> List[modbusBlock]:
+    """Blocks for the readable sensors, cached for each set of sensors"""
+    return planModbusBlocks(
+        modbusDict[key] for key in keys if not modbusDict[key].writeonly
+    )
+
 
 class SHM2(Device):
     """ """
@@ -167,22 +227,49 @@ class SHM2(Device):
             sensorDef.addr, sensorDef.slaveid, sensorDef.valueFormat
         )
 
-    async def read_modbus(self, register: int, slave: int, number_format: str) -> int:
-        """Read from modbus"""
+    async def _read_registers(self, register: int, count: int, slave: int) -> bytes:
+        """Read count registers from modbus and return them as bytes"""
         try:
             ret = await self._client.read_holding_registers(
-                register, count=2, device_id=slave
+                register, count=count, device_id=slave
             )
         except ModbusException as exc:
             _LOGGER.error(exc)
             raise SmaConnectionException(f"ERROR: exception in pymodbus {exc}") from exc
         if ret.isError():
             _LOGGER.error(f"ERROR: pymodbus returned an error! {ret}")
-            raise SmaReadException(f"Modbus {register} Slave:{slave} Count: 2")
-        if number_format.lower() == "u32":
-            return ret.registers[0] * (2**16) + ret.registers[1]
-        else:
+            raise SmaReadException(f"Modbus {register} Slave:{slave} Count: {count}")
+        return _blockStruct(count).pack(*ret.registers)
+
+    async def read_modbus(self, register: int, slave: int, number_format: str) -> int:
+        """Read from modbus"""
+        fmt = REGISTER_FORMATS.get(number_format.lower())
+        if fmt is None:
             raise ValueError(f"Unsupported format {number_format}")
+        data = await self._read_registers(register, fmt.size // 2, slave)
+        return fmt.unpack(data)[0]
+
+    async def _read_blocks(self, blocks: List[modbusBlock]) -> Dict[str, int]:
+        """Read the blocks and return the values by sensor key"""
+        values: Dict[str, int] = {}
+        for block in blocks:
+            try:
+                data = await self._read_registers(
+                    block.addr, block.count, block.slaveid
+                )
+            except SmaReadException:
+                if len(block.entries) == 1:
+                    raise
+                # A register in the block is not supported, read one by one
+                _LOGGER.debug("Reading block %s one by one", block.addr)
+                for sensorDef in block.entries:
+                    values[sensorDef.sensor.key] = await self._read_sensor(sensorDef)
+                continue
+            for sensorDef in block.entries:
+                values[sensorDef.sensor.key] = REGISTER_FORMATS[
+                    sensorDef.valueFormat
+                ].unpack_from(data, (sensorDef.addr - block.addr) * 2)[0]
+        return values
 
     async def new_session(self) -> bool:
         """Starts a new session"""
@@ -220,8 +307,9 @@ class SHM2(Device):
         """List of all devices"""
         self._device_list = {}
         serial = str(await self.read_modbus(30005, 1, "u32"))
-        device = await self.read_modbus(30053, 1, "u32")
-        vendor = await self.read_modbus(30055, 1, "u32")
+        device, vendor = _DEVICE_VENDOR_STRUCT.unpack(
+            await self._read_registers(30053, 4, 1)
+        )
         deviceName = SMATagList.get(device, f"Unknown Device {device}")
         vendorName = SMATagList.get(vendor, f"Unknown Vendor {vendor}")
         self._device_list[serial] = DeviceInformation(
@@ -232,20 +320,23 @@ class SHM2(Device):
     async def read(self, sensors: Sensors, deviceID: str | None = None) -> bool:
         """Updates all sensors"""
         notfound = []
+        keys = tuple(sensor.key for sensor in sensors if sensor.key in modbusDict)
+        values = await self._read_blocks(_planForKeys(keys))
         for sensor in sensors:
             #            print(sensor)
             if sensor.key not in modbusDict:
                 notfound.append(sensor.key)
                 continue
             sensorDef = modbusDict[sensor.key]
-            value = None
             if not sensorDef.writeonly:
-                value = await self._read_sensor(sensorDef)
-                if sensor.factor and sensor.factor != 1:
-                    value = round(value / sensor.factor, 4)
+                value = values[sensor.key]
                 sensor.value = value
+                if sensor.factor and sensor.factor != 1:
+                    sensor.value = round(value / sensor.factor, 4)
                 if sensor.mapper:
-                    sensor.mapped_value = sensor.mapper.get(value, str(value))
+                    sensor.mapped_value = sensor.mapper.get(
+                        sensor.value, str(sensor.value)
+                    )
             else:
                 if sensor.key in self._sensorValues:
                     sensor.value = self._sensorValues[sensor.key]
@@ -14,14 +14,17 @@ import logging
 import struct
 import time
 from asyncio import DatagramProtocol, Future
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
 
 from .const import SMATagList
 from .definitions_speedwire import (
     SpeedwireFrame,
     commands,
     responseDef,
+    sensorKey2command,
     speedwireHeader,
     speedwireHeader6065,
 )
@@ -41,6 +44,146 @@ NO_HANDLER_FOR_MIN_TIMEDELTA = timedelta(
 )  # How often to report a "known unknown" response
 
 
+# Register code of a response
+_CODE_STRUCT = struct.Struct("<L")
+# Register code and timestamp at the start of each register
+_REGISTER_HEADER_STRUCT = struct.Struct("<LL")
+
+# Values marking "not available" in a register
+NAN_VALUES = frozenset([0xFFFFFFFF, 0x80000000, 0xFFFFFFEC, -0x80000000, 0xFFFFFE])
+
+
+@lru_cache(maxsize=None)
+def _registerStruct(valueFormat: str, count: int) -> struct.Struct:
+    """Struct for all values of a register payload"""
+    return struct.Struct(f"<{count}{valueFormat}")
+
+
+@dataclass
+class ResponseHandler:
+    """Response definition of a register, compiled for decoding"""
+
+    valueFormat: str
+    converter: Callable[[int], Any] | None
+    mask: int | None
+    sensor: Sensor | List[Sensor] | None
+    idx: int
+    overwrite: bool
+
+    @classmethod
+    def fromDefinition(cls, handler: Dict[str, Any]) -> "ResponseHandler":
+        """Compile a handler of responseDef"""
+        converter = None
+        fmt = handler.get("format", "")
+        if fmt == "int":
+            valueFormat = "l"
+        elif fmt == "" or fmt == "uint":
+            valueFormat = "L"
+        elif fmt == "version":
+            valueFormat = "L"
+            converter = version_int_to_string
+        else:
+            raise ValueError(f"Unknown Format {fmt}")
+        return cls(
+            valueFormat,
+            converter,
+            handler.get("mask"),
+            handler.get("sensor"),
+            handler.get("idx", 0),
+            handler.get("overwrite", True),
+        )
+
+    def extractvalues(self, subdata: bytes | memoryview) -> list[Any]:
+        """Unpack all values of the register payload at once"""
+        count = (len(subdata) - 8) // 4
+        values: list[Any] = []
+        for v in _registerStruct(self.valueFormat, count).unpack_from(subdata, 8):
+            if v in NAN_VALUES:
+                v = None
+            else:
+                if self.converter:
+                    v = self.converter(v)
+                if self.mask is not None:
+                    v = v & self.mask
+            values.append(v)
+        return values
+
+
+responseHandlers: Dict[int, List[ResponseHandler]] = {
+    int(code, 16): [ResponseHandler.fromDefinition(h) for h in handlers]
+    for code, handlers in responseDef.items()
+}
+
+# Some devices answer with a slightly different code (last nibble).
+# Map the code without the last nibble to the first known code.
+responsePrefixes: Dict[int, int] = {}
+for _code in responseHandlers:
+    responsePrefixes.setdefault(_code >> 4, _code)
+
+
+def _register_codes(first: int, last: int) -> int:
+    """Number of register codes in a range. The lowest byte is the index within a code."""
+    return (last >> 8) - (first >> 8) + 1
+
+
+def coalesce_commands(cmds: List[str], maxCodes: int) -> Dict[str, Dict[str, Any]]:
+    """Merge queries with the same command word and overlapping or adjacent ranges.
+
+    Ranges are only merged as long as the result spans at most maxCodes
+    register codes, or if one range contains the other.
+
+    Args:
+        cmds (List[str]): names of the commands to query
+        maxCodes (int): maximum number of register codes of a merged query
+
+    Returns:
+        Dict[str, Dict[str, Any]]: query name => command definition, merged
+            queries are named after their parts joined by "+"
+    """
+    groups: Dict[int, List[List[str]]] = {}
+    order: Dict[str, int] = {}
+    for pos, name in enumerate(cmds):
+        order.setdefault(name, pos)
+    queries = [
+        (pos, name, commands[name])
+        for name, pos in order.items()
+        if "first" not in commands[name]
+    ]
+    byfirst = sorted(
+        (n for n in order if "first" in commands[n]),
+        key=lambda n: (commands[n]["first"], commands[n]["last"]),
+    )
+    for name in byfirst:
+        cmd = commands[name]
+        cmdgroups = groups.setdefault(cmd["command"], [])
+        if cmdgroups:
+            group = cmdgroups[-1]
+            first = commands[group[0]]["first"]
+            last = max(commands[n]["last"] for n in group)
+            if cmd["first"] <= last + 1 and (
+                cmd["last"] <= last
+                or _register_codes(first, max(last, cmd["last"])) <= maxCodes
+            ):
+                group.append(name)
+                continue
+        cmdgroups.append([name])
+
+    for word, cmdgroups in groups.items():
+        for group in cmdgroups:
+            queries.append(
+                (
+                    min(order[n] for n in group),
+                    "+".join(group),
+                    {
+                        "command": word,
+                        "first": commands[group[0]]["first"],
+                        "last": max(commands[n]["last"] for n in group),
+                    },
+                )
+            )
+    return {name: query for _, name, query in sorted(queries)}
+
+
 class SMAClientProtocol(DatagramProtocol):
     """Basic Class for communication"""
 
@@ -77,6 +220,30 @@ class SMAClientProtocol(DatagramProtocol):
         self._defaultRetries = int(options.get("defaultRetries", 2))
         self._loginRetries = int(options.get("loginRetries", 3))
         self._loggedIn = False
+        self._loginTime: float = 0
+        self._serial = ""
+        # Stay logged in between queries instead of logging off after each one
+        self._keepAlive = str(options.get("keepAlive", False)).lower() in [
+            "1",
+            "true",
+            "yes",
+        ]
+        # Age in seconds after which a kept alive login is refreshed
+        self._loginRefresh = float(
+            options.get("loginRefresh", SpeedwireFrame.LOGIN_TIMEOUT * 0.8)
+        )
+        # Number of commands in flight. 1 sends one command after the other.
+        self._pipeline = max(1, int(options.get("pipeline", 1)))
+        self._pending: Dict[int, Future] = {}
+        self._pipelineTask: asyncio.Task | None = None
+        # Merge queries of adjacent register ranges into one frame
+        self._coalesce = str(options.get("coalesce", False)).lower() in [
+            "1",
+            "true",
+            "yes",
+        ]
+        self._coalesceMaxCodes = int(options.get("coalesceMaxCodes", 16))
+        self._queries: Dict[str, Dict[str, Any]] = {}
         self._failedCounter = 0
         self._sendCounter = 0
         self._commandTimeout = float(options.get("commandTimeout", 0.5))
@@ -130,17 +297,42 @@ class SMAClientProtocol(DatagramProtocol):
                 self.debug["failedCounter"] += 1
         await self._send_next_command()
 
-    def _confirm_repsonse(self, code: int = -1):
-        """Mark the commandFuture as done"""
+    def _confirm_repsonse(self, code: int = -1, pktId: int | None = None):
+        """Mark the commandFuture (or the pending command with pktId) as done"""
+        if self._pipeline > 1:
+            fut = None if pktId is None else self._pending.get(pktId & 0x7FFF)
+            if fut is None or fut.done():
+                _LOGGER.debug(f"unexpected message {code:08X} pktId {pktId}")
+                return
+            fut.set_result(True)
+            return
         if self._commandFuture is None or self._commandFuture.done():
             _LOGGER.debug(f"unexpected message {code:08X}")
             return
         self._commandFuture.set_result(True)
 
     async def start_query(self, cmds: List, future: Future, group: str) -> None:
+        if self._pipelineTask is not None and not self._pipelineTask.done():
+            # The last query timed out, it must not resolve the new future
+            self._pipelineTask.cancel()
+            try:
+                await self._pipelineTask
+            except asyncio.CancelledError:
+                pass
         self.cmds = []
+        if (
+            self._loggedIn
+            and self._keepAlive
+            and time.time() - self._loginTime > self._loginRefresh
+        ):
+            _LOGGER.debug("Refreshing login")
+            self._loggedIn = False
         if not self._loggedIn:
             self.cmds.append("login")
+        self._queries = {}
+        if self._coalesce:
+            self._queries = coalesce_commands(cmds, self._coalesceMaxCodes)
+            cmds = list(self._queries)
         self.cmds.extend(cmds)
         self.future = future
         self.cmdidx = 0
@@ -148,12 +340,79 @@ class SMAClientProtocol(DatagramProtocol):
         self._sendCounter = 0
         self._group = group
         self.data_values = {}
+        if self._loggedIn:
+            # No login response in this query, reuse the data of the last one
+            self.data_values = {"error": 0, "serial": self._serial}
         self.sensors = {}
         _LOGGER.debug(f"Start Query {cmds}")
         #        _LOGGER.debug("Sending login")
         self.debug["msg"].append(["SEND", "login"])
         self._firstSend = time.time()
-        await self._send_next_command()
+        if self._pipeline > 1:
+            self._pipelineTask = asyncio.get_running_loop().create_task(
+                self._run_pipeline()
+            )
+        else:
+            await self._send_next_command()
+
+    async def _run_pipeline(self) -> None:
+        """Send the commands with up to `pipeline` commands in flight.
+
+        The responses are matched to the commands by their packet id."""
+        try:
+            cmds = self.cmds
+            if cmds and cmds[0] == "login":
+                cmds = cmds[1:]
+                if not await self._send_and_wait("login"):
+                    if self.future and not self.future.done():
+                        self.future.set_exception(
+                            SmaConnectionException(
+                                "Login failed! No Response from Device!"
+                            )
+                        )
+                if self.future is None or self.future.done():
+                    await self._finish_query()
+                    return
+            window = asyncio.Semaphore(self._pipeline)
+
+            async def send(cmd: str) -> None:
+                async with window:
+                    await self._send_and_wait(cmd)
+
+            await asyncio.gather(*(send(cmd) for cmd in cmds))
+        except RuntimeError as exc:
+            if self.future and not self.future.done():
+                self.future.set_exception(exc)
+        await self._finish_query()
+
+    async def _send_and_wait(self, cmd: str) -> bool:
+        """Send a command and wait for its response. Resend it on timeouts."""
+        retries = self._loginRetries if cmd == "login" else self._defaultRetries
+        self.debug["sendcounter"] += 1
+        self._sendCounter += 1
+        await asyncio.sleep(self._commandDelay)
+        for resend in range(retries + 1):
+            if resend > 0:
+                _LOGGER.debug(f"Timeout in command {cmd}. Resendcounter: {resend}")
+                self.debug["resendcounter"] += 1
+            frame = self._get_frame(cmd)
+            pktId = SpeedwireFrame.getPacketId(frame)
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[pktId] = fut
+            self.debug["msg"].append(["SEND", cmd])
+            self._lastSend = time.time()
+            try:
+                self._send_command(frame, False)
+                await asyncio.wait_for(fut, timeout=self._commandTimeout)
+                return True
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._pending.pop(pktId, None)
+        _LOGGER.debug(f"Timeout in command {cmd}. Giving up.")
+        self._failedCounter += 1
+        self.debug["failedCounter"] += 1
+        return False
 
     def connection_lost(self, exc: Exception | None) -> None:
         """connection lost handler"""
@@ -163,9 +422,10 @@ class SMAClientProtocol(DatagramProtocol):
 
     def _send_command(self, cmd: bytes, exceptResponse: bool = True) -> None:
         """Send the Command"""
-        _LOGGER.debug(
-            f"Sending command [{len(cmd)}] -- {binascii.hexlify(cmd).upper()}"  # type: ignore[str-bytes-safe]
-        )
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "Sending command [%d] -- %s", len(cmd), binascii.hexlify(cmd).upper()
+            )
         if exceptResponse:
             self._commandFuture = asyncio.get_running_loop().create_future()
             asyncio.get_running_loop().create_task(self.controller())
@@ -187,21 +447,7 @@ class SMAClientProtocol(DatagramProtocol):
         if not self.future:
             return
         if self.cmdidx >= len(self.cmds):
-            await self.logoff()
-            f = self.future
-            self.future = None
-            await asyncio.sleep(0.2)  # Wait for delayed responses
-            self.debug["data"] = self.data_values
-            self.cmds = []
-            self.cmdidx = 0
-            if not f.done():
-                f.set_result(True)
-            if self._firstSend:
-                self.debug["msg"].append(
-                    ["TOTAL", 0, "", round(time.time() - self._firstSend, 2)]
-                )
-                self._firstSend = None
-
+            await self._finish_query()
         else:
             if self._resendcounter == 0:
                 await asyncio.sleep(self._commandDelay)
@@ -209,31 +455,33 @@ class SMAClientProtocol(DatagramProtocol):
             self.debug["msg"].append(["SEND", self.cmds[self.cmdidx]])
             _LOGGER.debug("Sending " + self.cmds[self.cmdidx])
             self._lastSend = time.time()
-            if (self.cmds[self.cmdidx]) == "login":
-                groupidx = ["user", "installer"].index(self._group) == 1
-                self._send_command(
-                    self.speedwire.getLoginFrame(self.password, 0x23021923, groupidx)
-                )
-            else:
-                self._send_command(
-                    self.speedwire.getQueryFrame(0x23021923, self.cmds[self.cmdidx])
-                )
-
-    def _getFormat(self, handler: dict) -> tuple:
-        """Return the necessary information for extracting the information"""
-        converter = None
-        format = handler.get("format", "")
-        if format == "int":
-            format = "<l"
-        elif format == "" or format == "uint":
-            format = "<L"
-        elif format == "version":
-            format = "<L"
-            converter = version_int_to_string
-        else:
-            raise ValueError(f"Unknown Format {format}")
-        size = struct.calcsize(format)
-        return (format, size, converter)
+            self._send_command(self._get_frame(self.cmds[self.cmdidx]))
+
+    def _get_frame(self, cmd: str) -> bytes:
+        """Return the frame for a command"""
+        if cmd == "login":
+            groupidx = ["user", "installer"].index(self._group) == 1
+            return self.speedwire.getLoginFrame(self.password, 0x23021923, groupidx)
+        return self.speedwire.getQueryFrame(0x23021923, cmd, self._queries.get(cmd))
+
+    async def _finish_query(self) -> None:
+        """Log off (unless the session is kept alive) and mark the query as done"""
+        f = self.future
+        self.future = None
+        # A kept alive session stays logged in, unless no command was answered
+        if not self._keepAlive or self._failedCounter >= len(self.cmds):
+            await self.logoff()
+            await asyncio.sleep(0.2)  # Wait for delayed responses
+        self.debug["data"] = self.data_values
+        self.cmds = []
+        self.cmdidx = 0
+        if f is not None and not f.done():
+            f.set_result(True)
+        if self._firstSend:
+            self.debug["msg"].append(
+                ["TOTAL", 0, "", round(time.time() - self._firstSend, 2)]
+            )
+            self._firstSend = None
 
     def handle_login(self, msg: speedwireHeader6065) -> None:
         """Is called if a login response is received"""
@@ -241,6 +489,7 @@ class SMAClientProtocol(DatagramProtocol):
         self.sensors = {}
         self.data_values = {"error": msg.error}
         self.data_values["serial"] = str(msg.src_serial)
+        self._serial = self.data_values["serial"]
         if msg.error == 256:
             _LOGGER.error("Login failed!")
             if self.future:
@@ -251,6 +500,7 @@ class SMAClientProtocol(DatagramProtocol):
                 )
         else:
             self._loggedIn = True
+            self._loginTime = time.time()
 
     def handle_newvalue(self, sensor: Sensor, value: Any, overwrite: bool) -> None:
         """Set the new value to the sensor"""
@@ -271,51 +521,25 @@ class SMAClientProtocol(DatagramProtocol):
         self.sensors[sen.key] = sen
         self.data_values[sen.key] = value
 
-    def extractvalues(self, handler: Dict, subdata: bytes) -> list[Any]:
-        (formatdef, size, converter) = self._getFormat(handler)
-        values = []
-        for idx in range(8, len(subdata), size):
-            v = struct.unpack(formatdef, subdata[idx : idx + size])[0]
-            if v in [0xFFFFFFFF, 0x80000000, 0xFFFFFFEC, -0x80000000, 0xFFFFFE]:
-                v = None
-            else:
-                if converter:
-                    v = converter(v)
-                if "mask" in handler:
-                    v = v & handler["mask"]
-            values.append(v)
-        return values
-
-    def fixID(self, orig: str) -> str:
-        if orig in responseDef:
+    def fixID(self, orig: int) -> int:
+        if orig in responseHandlers:
             return orig
-        for code in responseDef.keys():
-            if code[0:7] == orig[:7]:
-                return code
-        return orig
+        return responsePrefixes.get(orig >> 4, orig)
 
-    def handle_register(self, subdata: bytes, register_idx: int) -> None:
+    def handle_register(self, subdata: bytes | memoryview, register_idx: int) -> None:
         """Handle the payload with all the registers"""
-        code = int.from_bytes(subdata[0:4], "little")
-        # c = f"{(code & 0xFFFFFFFF):08X}"
-        c = f"{code:08X}"
-        msec = int.from_bytes(subdata[4:8], "little")  # noqa: F841
+        (code, msec) = _REGISTER_HEADER_STRUCT.unpack_from(subdata)  # noqa: F841
 
         # Fix for strange response codes
-        self.debug["ids"].add(c[6:])
-        self._id = c[6:]
-        c = self.fixID(c)
+        self._id = code & 0xFF
+        self.debug["ids"].add(self._id)
+        code = self.fixID(code)
 
         # Handle unknown Responses
-        if c not in responseDef:
-            values = []
-            valuesPos = []
-            for idx in range(8, len(subdata), 4):
-                v = struct.unpack("<l", subdata[idx : idx + 4])[0]
-                values.append(v)
-                valuesPos.append(f"{idx + 54}")
+        handlers = responseHandlers.get(code)
+        if handlers is None:
+            c = f"{code:08X}"
             # check if the value 'c' was already logged within the last 24 hrs (TIMEDELTA def above)
-
             if (ts := self.debug.get("warned", {}).get(c)) and ts > (
                 datetime.now() - NO_HANDLER_FOR_MIN_TIMEDELTA
             ):
@@ -323,6 +547,9 @@ class SMAClientProtocol(DatagramProtocol):
                 # it also already known to "unfinished" set
                 return
 
+            count = (len(subdata) - 8) // 4
+            values = list(_registerStruct("l", count).unpack_from(subdata, 8))
+            valuesPos = [f"{idx + 54}" for idx in range(8, 8 + count * 4, 4)]
             _LOGGER.debug(f"No Handler for {c}: {values} @ {valuesPos}")
             self.debug["unfinished"].add(f"{c}")
             self.debug["warned"][
@@ -331,12 +558,12 @@ class SMAClientProtocol(DatagramProtocol):
             return
 
         # Handle known repsones
-        for handler in responseDef[c]:
-            values = self.extractvalues(handler, subdata)
-            if "sensor" not in handler:
+        for handler in handlers:
+            if handler.sensor is None:
                 continue
+            values = handler.extractvalues(subdata)
             v = None
-            if handler["idx"] == 0xFF:
+            if handler.idx == 0xFF:
                 """For some responses, a list is returned and the correct value
                 within this list is marked by the top 8 bits."""
                 for origValue in values:
@@ -344,25 +571,26 @@ class SMAClientProtocol(DatagramProtocol):
                         v = origValue & 0x00FFFFFF
                         break
             else:
-                v = values[handler["idx"]]
+                v = values[handler.idx]
 
-            sensor = handler["sensor"]
+            sensor = handler.sensor
 
             # Special handling for a response that returns two values under the same code
             if isinstance(sensor, List):
                 if register_idx >= len(sensor):
                     _LOGGER.warning(
-                        f"No Handler for {c} at register idx {register_idx}: {values}"
+                        f"No Handler for {code:08X} at register idx {register_idx}: {values}"
                     )
                     continue
                 _LOGGER.debug(
-                    f"Special Handler for {c} at register idx {register_idx}: {values}"
+                    f"Special Handler for {code:08X} at register idx {register_idx}: {values}"
                 )
                 sensor = sensor[register_idx]
-            _LOGGER.debug(
-                f"ID: {self._id} Values {sensor.name}/{sensor.key}: {v} {values}"
-            )
-            self.handle_newvalue(sensor, v, handler.get("overwrite", True))
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug(
+                    f"ID: {self._id:02X} Values {sensor.name}/{sensor.key}: {v} {values}"
+                )
+            self.handle_newvalue(sensor, v, handler.overwrite)
 
     # Unfortunately, there is no known method of determining the size of the registers
     # from the message. Therefore, the register size is determined from the number of
@@ -379,60 +607,63 @@ class SMAClientProtocol(DatagramProtocol):
 
     # Main routine for processing received messages.
     def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
-        _LOGGER.debug(f"RECV: {addr} Len:{len(data)} {binascii.hexlify(data).upper()}")  # type: ignore[str-bytes-safe]
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "RECV: %s Len:%d %s", addr, len(data), binascii.hexlify(data).upper()
+            )
         delta = 0.0
         if self._lastSend > 0:
             delta = time.time() - self._lastSend
             self._lastSend = 0
-        self.debug["msg"].append(
-            [
-                "RECV",
-                len(data),
-                binascii.hexlify(data).upper().decode("utf-8"),
-                round(delta, 2),
-            ]
-        )
+        # The packet is kept as is, the hex dump is created by get_debug
+        self.debug["msg"].append(["RECV", len(data), data, round(delta, 2)])
+
+        # All headers and registers are parsed from views on the packet
+        view = memoryview(data)
 
         # Check if message is a 6065 protocol
-        msg = speedwireHeader.from_packed(data[0:18])
+        msg = speedwireHeader.from_packed(view[0:18])
         if not msg.check6065():
             _LOGGER.debug("Ignoring non 6065 Response. %d", msg.protokoll)
             return
 
         # If the requested information is not available, send the next command,
         if len(data) < 58:
-            _LOGGER.debug(f"NACK [{len(data)}] -- {data!r}")
-            self._confirm_repsonse()
+            _LOGGER.debug("NACK [%d] -- %r", len(data), data)
+            pktId = None
+            if len(data) >= 54:
+                pktId = speedwireHeader6065.from_packed(view[18 : 18 + 36]).pktId
+            self._confirm_repsonse(pktId=pktId)
             return
 
         # Handle Login Responses
-        msg6065 = speedwireHeader6065.from_packed(data[18 : 18 + 36])
+        msg6065 = speedwireHeader6065.from_packed(view[18 : 18 + 36])
         if msg6065.isLoginResponse():
             self.handle_login(msg6065)
-            self._confirm_repsonse()
+            self._confirm_repsonse(pktId=msg6065.pktId)
             return
 
         # Filter out non matching responses
         (cnt_registers, size_registers) = self.calc_register(data, msg6065)
-        code = int.from_bytes(data[54:58], "little")
+        (code,) = _CODE_STRUCT.unpack_from(data, 54)
         codem = code & 0x00FFFF00
         if len(data) == 58 and codem == 0:
-            _LOGGER.debug(f"NACK [{len(data)}] -- {data!r}")
-            self._confirm_repsonse()
+            _LOGGER.debug("NACK [%d] -- %r", len(data), data)
+            self._confirm_repsonse(pktId=msg6065.pktId)
             return
         if size_registers <= 0 or size_registers not in [16, 28, 40]:
             _LOGGER.warning(
                 f"Skipping message. --- Len {data!r} Ril {codem} {cnt_registers} x {size_registers} bytes"
             )
-            self._confirm_repsonse(code)
+            self._confirm_repsonse(code, msg6065.pktId)
             return
 
         # Extract the values for each register
         for idx in range(0, cnt_registers):
             start = idx * size_registers + 54
-            self.handle_register(data[start : start + size_registers], idx)
+            self.handle_register(view[start : start + size_registers], idx)
 
-        self._confirm_repsonse(code)
+        self._confirm_repsonse(code, msg6065.pktId)
 
 
 class SMAspeedwireINV(Device):
@@ -554,7 +785,7 @@ class SMAspeedwireINV(Device):
             raise SmaConnectionException("protocol not initialized")
 
         fut = asyncio.get_running_loop().create_future()
-        c = self._protocol.allCmds
+        c = self._commands_for(sensors)
         await self._protocol.start_query(c, fut, self._group)
         try:
             await asyncio.wait_for(fut, timeout=self._protocol._overallTimeout)
@@ -564,6 +795,17 @@ class SMAspeedwireINV(Device):
             self._debug["overalltimeout"] += 1
             raise e
 
+    def _commands_for(self, sensors: Sensors) -> list[str]:
+        """Return the commands needed to read the enabled sensors"""
+        if self._protocol is None:
+            raise SmaConnectionException("protocol not initialized")
+        needed = {
+            sensorKey2command[sen.key]
+            for sen in sensors
+            if sen.enabled and sen.key in sensorKey2command
+        }
+        return [cmd for cmd in self._protocol.allCmds if cmd in needed]
+
     def _update_sensors(
         self, sensors: Sensors, sensorReadings: dict[str, Sensor], deviceID: str | None
     ) -> None:
@@ -588,8 +830,15 @@ class SMAspeedwireINV(Device):
 
         ret = self._protocol.debug.copy()
         ret["unfinished"] = list(ret["unfinished"])
-        ret["msg"] = list(ret["msg"])
-        ret["ids"] = list(ret["ids"])
+        ret["msg"] = [
+            (
+                [m[0], m[1], binascii.hexlify(m[2]).upper().decode("utf-8"), m[3]]
+                if m[0] == "RECV"
+                else m
+            )
+            for m in ret["msg"]
+        ]
+        ret["ids"] = [f"{i:02X}" for i in ret["ids"]]
         ret["device_info"] = self._deviceinfo
         ret["timeouts"] = self._debug["overalltimeout"]
         return ret
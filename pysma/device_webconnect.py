@@ -13,9 +13,10 @@ from dataclasses import asdict, dataclass
 from typing import Any, Dict, Optional
 
 import jmespath  # type: ignore
-from aiohttp import ClientSession, ClientTimeout, client_exceptions, hdrs
+from aiohttp import ClientSession, client_exceptions, hdrs
 
 from . import definitions_webconnect
+from .connection_pool import ConnectionPool
 from .const_webconnect import (
     DEFAULT_LANG,
     DEFAULT_TIMEOUT,
@@ -42,6 +43,7 @@ from .exceptions import (
     SmaReadException,
 )
 from .helpers import version_int_to_string
+from .l10n_cache import L10nTable, l10nCache
 from .sensor import Sensor, Sensors
 
 _LOGGER = logging.getLogger(__name__)
@@ -68,7 +70,7 @@ class SMAwebconnect(Device):
     _sid: Optional[str]
     _uid: Optional[str]
     _lang: str
-    _l10n: Optional[dict]
+    _l10n: Optional[L10nTable]
     _devclass: Optional[str]
     _device_info_sensors: Sensors
 
@@ -107,10 +109,12 @@ class SMAwebconnect(Device):
         if not url.startswith("http"):
             self._url = "http://" + self._url
         self._aio_session = session
+        self._pool = ConnectionPool(session, DEFAULT_TIMEOUT)
         self._sid = None
         self._uid = uid
         self._lang = lang
         self._l10n = None
+        self._l10nFirmware = ""
         self._devclass = None
         self._debug = Debug_information_webconnect()
         self._device_info_sensors = Sensors(
@@ -141,10 +145,9 @@ class SMAwebconnect(Device):
         max_retries = 2
         for retry in range(max_retries):
             try:
-                async with self._aio_session.request(
+                async with self._pool.request(
                     method,
                     self._url + url,
-                    timeout=ClientTimeout(total=DEFAULT_TIMEOUT),
                     **kwargs,
                 ) as res:
                     res_json = await res.json()
@@ -205,21 +208,56 @@ class SMAwebconnect(Device):
 
         return await self._request_json(hdrs.METH_POST, url, **params)
 
-    async def _read_l10n(self) -> dict:
+    async def _read_firmware(self, result_body: dict) -> str:
+        """Firmware version of the device, part of the key of the l10n cache.
+
+        The version is taken from the values of the read. It is requested
+        separately, if it is still unknown when the l10n file is needed.
+        """
+        sen = self._device_info_sensors["device_sw_version"]
+        if result_body and sen.key in result_body:
+            sen.extract_value(result_body)
+        elif sen.value is None and self._l10n is None and self._new_session_data:
+            try:
+                payload = {"destDev": [], "keys": [sen.key]}
+                sen.extract_value(await self._read_body(URL_VALUES, payload) or {})
+            except (SmaReadException, SmaConnectionException) as exc:
+                # The l10n file is loaded without firmware, i.e. not shared
+                _LOGGER.debug("Could not read the firmware version: %s", exc)
+        return version_int_to_string(sen.value)
+
+    async def _read_l10n(self, firmware: str = "") -> L10nTable:
         """Read device language file. Returns cached value on subsequent calls.
 
+        The files are shared by all devices with the same language and
+        firmware, see l10n_cache. A changed firmware reloads the file.
+
+        Args:
+            firmware (str, optional): firmware version of the device. Defaults to unknown.
+
         Returns:
-            dict: json returned by device
+            dict: translations by tag
         """
+        if firmware != self._l10nFirmware:
+            self._l10n = None
         if self._l10n is None:
-            self._l10n = await self._get_json(f"/data/l10n/{self._lang}.json")
+            self._l10nFirmware = firmware
+            self._l10n = await l10nCache.get_or_load(
+                self._lang,
+                firmware,
+                lambda: self._get_json(f"/data/l10n/{self._lang}.json"),
+            )
             if len(self._l10n) == 0:
                 _LOGGER.warning(
                     "Language '%s' not supported, fallback to '%s'",
                     self._lang,
                     DEFAULT_LANG,
                 )
-                self._l10n = await self._get_json(f"/data/l10n/{DEFAULT_LANG}.json")
+                self._l10n = await l10nCache.get_or_load(
+                    DEFAULT_LANG,
+                    firmware,
+                    lambda: self._get_json(f"/data/l10n/{DEFAULT_LANG}.json"),
+                )
         return self._l10n
 
     async def _read_body(self, url: str, payload: dict) -> dict:
@@ -306,11 +344,13 @@ class SMAwebconnect(Device):
     async def close_session(self) -> None:
         """Close the session login."""
         if self._sid is None:
+            await self._pool.close()
             return
         try:
             await self._post_json(URL_LOGOUT)
         finally:
             self._sid = None
+            await self._pool.close()
 
     # @override
     async def read(self, sensors: Sensors, deviceID: str | None = None) -> bool:
@@ -334,15 +374,15 @@ class SMAwebconnect(Device):
             result_body = await self._read_body(URL_VALUES, payload)
             self._debug.last_json = result_body
 
-        notfound = []
-        l10n = await self._read_l10n()
-        for sen in sensors:
-            if sen.enabled:
-                if sen.key in result_body:
-                    sen.extract_value(result_body, l10n)
-                    continue
+        l10n = await self._read_l10n(await self._read_firmware(result_body))
+        changed = sensors.extract_values(result_body, l10n)
+        _LOGGER.debug("%d of %d sensors changed", len(changed), len(sensors))
 
-                notfound.append(f"{sen.name} [{sen.key}]")
+        notfound = [
+            f"{sen.name} [{sen.key}]"
+            for sen in sensors
+            if sen.enabled and sen.key not in result_body
+        ]
 
         if notfound:
             _LOGGER.info(
@@ -510,6 +550,7 @@ class SMAwebconnect(Device):
         debug = asdict(self._debug)
         debug["device_info_sensors"] = self._device_info_sensors
         debug["url"] = self._url
+        debug["connections"] = asdict(self._pool.statistics)
         return debug
 
     # @override
@@ -535,6 +576,18 @@ class SMAwebconnect(Device):
             results.append(di)
         return results
 
+    # @override
+    def set_options(self, options: Dict[str, Any]) -> None:
+        """Set low-level options."""
+        for key, value in options.items():
+            if key in ConnectionPool.OPTIONS:
+                self._pool.set_options({key: value})
+            elif key == "l10nCacheDir":
+                # The cache is shared by all webconnect devices
+                l10nCache.directory = str(value) if value else None
+            else:
+                _LOGGER.error("Unknown Options: %s %s", key, value)
+
     # @override
     async def set_parameter(
         self, sensor: Sensor, value: int, deviceID: str | None = None
@@ -1,25 +1,49 @@
-""" Speedwire Discovery  """
+"""Speedwire Discovery"""
 
 import asyncio
 import logging
 import socket
 import struct
+from dataclasses import dataclass
+from typing import AsyncIterator
 
 from .definitions_speedwire import speedwireHeader
+from .device import DeviceInformation
+from .device_speedwire import SMAspeedwireINV
 
 _LOGGER = logging.getLogger(__name__)
 
+DISCOVERY_REQUEST = bytes.fromhex("534d4100000402a0ffffffff0000002000000000")
+
+
+@dataclass
+class DiscoveredDevice:
+    """Device that answered the discovery request"""
+
+    addr: tuple[str, int]
+    device: DeviceInformation | None = None
+    exception: Exception | None = None
+
 
 class Discovery:
-    """Class for the detection of SMA Devices in the local network."""
+    """Class for the detection of SMA Devices in the local network.
+
+    The requests are sent from an own socket with an ephemeral port, the
+    devices answer to this port. Port 9522 is left to the energy meters.
+    """
+
+    # Requests are repeated, because UDP packets can get lost
+    REQUESTS = 4
+    REQUEST_INTERVAL = 0.5
 
     def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
         """init"""
         self.loop = loop
-        self.transport: asyncio.BaseTransport
+        self.transport: asyncio.DatagramTransport | None = None
         self.addr = "239.12.255.254"
         self.port = 9522
         self.discovered: list[tuple[str, int]] = []
+        self._found: asyncio.Queue[tuple[str, int]] | None = None
 
     def getDiscoverySocket(self) -> socket.socket:
         addrinfo = socket.getaddrinfo(self.addr, None)[0]
@@ -29,45 +53,148 @@ class Discovery:
         )
         return sock
 
-    async def run(self) -> list:
-        """Start the Task"""
-        sock = self.getDiscoverySocket()
-        self.loop.create_future()
+    async def _open(self) -> None:
+        """Open the socket for the requests and replies"""
         await self.loop.create_datagram_endpoint(
             lambda: self,  # type: ignore[type-var]
-            sock=sock,
+            sock=self.getDiscoverySocket(),
         )
-        for i in range(0, 3):
-            await asyncio.sleep(0.5)
+
+    def _close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    async def run(self) -> list:
+        """Start the Task"""
+        await self._open()
+        try:
             self.sendDiscoveryRequest()
-        await asyncio.sleep(0.5)
+            for i in range(0, self.REQUESTS - 1):
+                await asyncio.sleep(self.REQUEST_INTERVAL)
+                self.sendDiscoveryRequest()
+            await asyncio.sleep(self.REQUEST_INTERVAL)
+        finally:
+            self._close()
         return self.discovered
 
+    async def discover(
+        self,
+        quietPeriod: float = 1.0,
+        expected: int | None = None,
+        timeout: float = 5.0,
+    ) -> AsyncIterator[tuple[str, int]]:
+        """Yield the address of each device as soon as it answers.
+
+        The request is repeated until the first device answers.
+
+        Args:
+            quietPeriod: stop, if no new device answered for this many seconds
+                after the start or the last answer
+            expected: stop, as soon as this number of devices answered
+            timeout: stop after this many seconds
+        """
+        self._found = asyncio.Queue()
+        await self._open()
+        try:
+            start = lastAnswer = nextRequest = self.loop.time()
+            sent = 0
+            answered = False
+            while expected is None or len(self.discovered) < expected:
+                now = self.loop.time()
+                resend = sent < self.REQUESTS and not answered
+                if resend and now >= nextRequest:
+                    self.sendDiscoveryRequest()
+                    sent += 1
+                    nextRequest = now + self.REQUEST_INTERVAL
+                deadline = min(start + timeout, lastAnswer + quietPeriod)
+                if now >= deadline:
+                    break
+                wait = deadline - now
+                if resend and sent < self.REQUESTS:
+                    wait = min(wait, nextRequest - now)
+                try:
+                    addr = await asyncio.wait_for(self._found.get(), wait)
+                except asyncio.TimeoutError:
+                    continue
+                answered = True
+                lastAnswer = self.loop.time()
+                yield addr
+        finally:
+            self._close()
+            self._found = None
+
+    async def runAdaptive(
+        self,
+        quietPeriod: float = 1.0,
+        expected: int | None = None,
+        password: str | None = None,
+        group: str = "user",
+    ) -> list[DiscoveredDevice]:
+        """Discover the devices and query their type in parallel.
+
+        See discover for quietPeriod and expected. The devices are only
+        identified, if a password is given.
+        """
+        devices: list[DiscoveredDevice] = []
+        tasks = []
+        async for addr in self.discover(quietPeriod, expected):
+            if password:
+                tasks.append(asyncio.create_task(self.identify(addr, password, group)))
+            else:
+                devices.append(DiscoveredDevice(addr))
+        devices.extend(await asyncio.gather(*tasks))
+        return devices
+
+    async def identify(
+        self,
+        addr: tuple[str, int],
+        password: str,
+        group: str = "user",
+        timeout: float = 10.0,
+    ) -> DiscoveredDevice:
+        """Query the TypeLabel of a device"""
+        ret = DiscoveredDevice(addr)
+        inv = SMAspeedwireINV(host=addr[0], group=group, password=password)
+        try:
+            # The session is tested with the query of TypeLabel and Firmware
+            await asyncio.wait_for(inv.new_session(), timeout)
+            ret.device = inv._deviceinfo
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            _LOGGER.debug("Could not identify %s: %s", addr[0], e)
+            ret.exception = e
+        finally:
+            try:
+                await inv.close_session()
+            except Exception:  # pylint: disable=broad-exception-caught
+                pass
+        return ret
+
     def connection_made(self, transport: asyncio.BaseTransport) -> None:
-        self.transport = transport
-        self.sendDiscoveryRequest()
+        self.transport = transport  # type: ignore[assignment]
 
     def sendDiscoveryRequest(self) -> None:
         """Send a discovery Request"""
-        _LOGGER.warn("Sending Discovery Request")
-        self.transport.sendto(  # type: ignore[attr-defined]
-            bytes.fromhex("534d4100000402a0ffffffff0000002000000000"),
-            (self.addr, self.port),
-        )
+        _LOGGER.debug("Sending Discovery Request")
+        assert self.transport is not None
+        self.transport.sendto(DISCOVERY_REQUEST, (self.addr, self.port))
 
     def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
         """Datagram received"""
         msg = speedwireHeader.from_packed(data[0:18])
         if not msg.isDiscoveryResponse():
-            _LOGGER.warning("Ignoring %s", msg)
+            _LOGGER.debug("Ignoring %s", msg)
             return
         if addr not in self.discovered:
             self.discovered.append(addr)
+            if self._found is not None:
+                self._found.put_nowait(addr)
 
     def error_received(self, exc: Exception) -> None:
         """Called by error."""
         _LOGGER.error("%s error occurred: %s", type(exc), exc)
 
-    def connection_lost(self, exc: Exception) -> None:
+    def connection_lost(self, exc: Exception | None) -> None:
         """Called by connection lost."""
-        _LOGGER.error("Socket closed, stop the event loop %s %s", type(exc), exc)
+        if exc is not None:
+            _LOGGER.error("Socket closed %s %s", type(exc), exc)
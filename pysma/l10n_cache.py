@@ -0,0 +1,143 @@
+"""Process-wide cache for the l10n files of webconnect devices.
+
+The l10n files are large and equal for all devices with the same language
+and firmware. They are downloaded once per process, optionally stored in a
+directory and kept as compact tables with integer tags as keys.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+L10nTable = Dict[int, str]
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def compactL10n(raw: Dict[str, Any]) -> L10nTable:
+    """Convert the l10n file of the device to a table with integer tags."""
+    return {int(k): v for k, v in raw.items() if k.isdigit()}
+
+
+class L10nCache:
+    """Cache of l10n tables by language and firmware.
+
+    The least recently used tables are dropped, if more than maxEntries
+    tables are cached. If a directory is set, the tables are also stored
+    on disk and survive a restart.
+    """
+
+    def __init__(self, maxEntries: int = 4, directory: Optional[str] = None) -> None:
+        """Init the cache"""
+        self.maxEntries = maxEntries
+        self.directory = directory
+        self._tables: OrderedDict[Tuple[str, str], L10nTable] = OrderedDict()
+        self._loading: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def clear(self) -> None:
+        """Drop all tables from memory"""
+        self._tables.clear()
+
+    def get(self, lang: str, firmware: str) -> Optional[L10nTable]:
+        """Return a table from memory"""
+        key = (lang, firmware)
+        if key not in self._tables:
+            return None
+        self._tables.move_to_end(key)
+        return self._tables[key]
+
+    def put(self, lang: str, firmware: str, table: L10nTable) -> None:
+        """Add a table to the cache"""
+        self._tables[(lang, firmware)] = table
+        self._tables.move_to_end((lang, firmware))
+        while len(self._tables) > self.maxEntries:
+            self._tables.popitem(last=False)
+
+    async def get_or_load(
+        self,
+        lang: str,
+        firmware: str,
+        loader: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> L10nTable:
+        """Return the table, load it from disk or with the loader if necessary.
+
+        Concurrent calls for the same table wait for one loader.
+        An empty file of the device is returned, but not cached. Without
+        firmware the file can not be shared and is always loaded.
+        """
+        if not firmware:
+            return compactL10n(await loader())
+        table = self.get(lang, firmware)
+        if table is not None:
+            return table
+        key = (lang, firmware)
+        if key in self._loading:
+            return await asyncio.shield(self._loading[key])
+        fut = asyncio.get_running_loop().create_future()
+        self._loading[key] = fut
+        try:
+            table = await self._load(lang, firmware, loader)
+            fut.set_result(table)
+            return table
+        except BaseException as exc:
+            fut.set_exception(exc)
+            # Mark the exception as retrieved, if nobody else is waiting
+            fut.exception()
+            raise
+        finally:
+            del self._loading[key]
+
+    async def _load(
+        self,
+        lang: str,
+        firmware: str,
+        loader: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> L10nTable:
+        if self.directory is not None:
+            table = await asyncio.to_thread(self._read_file, lang, firmware)
+            if table is not None:
+                self.put(lang, firmware, table)
+                return table
+        table = compactL10n(await loader())
+        if not table:
+            return table
+        self.put(lang, firmware, table)
+        if self.directory is not None:
+            await asyncio.to_thread(self._write_file, lang, firmware, table)
+        return table
+
+    def _filename(self, lang: str, firmware: str) -> str:
+        assert self.directory is not None
+        name = _UNSAFE_CHARS.sub("_", f"l10n_{lang}_{firmware}")
+        return os.path.join(self.directory, name + ".json")
+
+    def _read_file(self, lang: str, firmware: str) -> Optional[L10nTable]:
+        filename = self._filename(lang, firmware)
+        try:
+            with open(filename, "r", encoding="utf-8") as file:
+                return compactL10n(json.load(file))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            _LOGGER.warning("Could not read l10n cache %s: %s", filename, exc)
+            return None
+
+    def _write_file(self, lang: str, firmware: str, table: L10nTable) -> None:
+        filename = self._filename(lang, firmware)
+        try:
+            os.makedirs(self.directory, exist_ok=True)  # type: ignore[arg-type]
+            with open(filename + ".tmp", "w", encoding="utf-8") as file:
+                json.dump({str(k): v for k, v in table.items()}, file)
+            os.replace(filename + ".tmp", filename)
+        except OSError as exc:
+            _LOGGER.warning("Could not write l10n cache %s: %s", filename, exc)
+
+
+# Cache shared by all webconnect devices
+l10nCache = L10nCache()
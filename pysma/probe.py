@@ -0,0 +1,118 @@
+"""Fast checks of the transports used by the access methods.
+
+A full detection creates a device object and runs a complete login,
+which takes the whole timeout if nothing answers. The probes only open a
+TCP connection or send a single speedwire discovery request.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+
+from .discovery import DISCOVERY_REQUEST
+
+_LOGGER = logging.getLogger(__name__)
+
+PROBE_TIMEOUT = 1.0
+
+# Transports of the access methods. Energy meters only send multicast
+# packets and are not probed.
+TRANSPORTS: Dict[str, List[Tuple[str, int]]] = {
+    "webconnect": [("tcp", 80), ("tcp", 443)],
+    "ennexos": [("tcp", 80), ("tcp", 443)],
+    "speedwireinv": [("udp", 9522)],
+    "shm2": [("tcp", 502)],
+}
+
+
+async def probeTcp(ip: str, port: int, timeout: float = PROBE_TIMEOUT) -> bool:
+    """Check if a TCP connection to the port can be opened"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+class _SpeedwirePing(asyncio.DatagramProtocol):
+    """Send one discovery request and wait for any answer"""
+
+    def __init__(self, answered: asyncio.Future) -> None:
+        """init"""
+        self._answered = answered
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Send the request"""
+        transport.sendto(DISCOVERY_REQUEST)  # type: ignore[attr-defined]
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """Answer received"""
+        if not self._answered.done():
+            self._answered.set_result(True)
+
+    def error_received(self, exc: Exception) -> None:
+        """Port unreachable"""
+        if not self._answered.done():
+            self._answered.set_result(False)
+
+
+async def probeSpeedwire(
+    ip: str, timeout: float = PROBE_TIMEOUT, port: int = 9522
+) -> bool:
+    """Check if the ip answers a speedwire discovery request"""
+    loop = asyncio.get_running_loop()
+    answered: asyncio.Future = loop.create_future()
+    try:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _SpeedwirePing(answered), remote_addr=(ip, port)
+        )
+    except OSError:
+        return False
+    try:
+        return await asyncio.wait_for(answered, timeout)
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        transport.close()
+
+
+async def probeAccessMethods(
+    ip: str, accessmethods: List[str], timeout: float = PROBE_TIMEOUT
+) -> Dict[str, bool]:
+    """Probe the transports of the access methods.
+
+    Each transport is probed once. Access methods without a known
+    transport are always reported as answered.
+
+    Returns:
+        Dict[str, bool]: access method => transport answered
+    """
+    endpoints = list(
+        {
+            endpoint
+            for method in accessmethods
+            for endpoint in TRANSPORTS.get(method, [])
+        }
+    )
+    answers = await asyncio.gather(
+        *(
+            (
+                probeTcp(ip, port, timeout)
+                if protocol == "tcp"
+                else probeSpeedwire(ip, timeout, port)
+            )
+            for protocol, port in endpoints
+        )
+    )
+    answered = dict(zip(endpoints, answers))
+    _LOGGER.debug("Probed %s: %s", ip, answered)
+    return {
+        method: method not in TRANSPORTS
+        or any(answered[endpoint] for endpoint in TRANSPORTS[method])
+        for method in accessmethods
+    }
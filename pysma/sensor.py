@@ -1,9 +1,11 @@
 """Sensor classes for SMA WebConnect library for Python."""
 
 import copy
+import functools
 import logging
+import re
 from dataclasses import dataclass
-from typing import Any, Dict, Iterator, List, Optional, Union, cast
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union, cast
 
 import attr
 import jmespath  # type: ignore
@@ -13,6 +15,98 @@ from .const_webconnect import JMESPATH_VAL, JMESPATH_VAL_IDX, JMESPATH_VAL_STR
 
 _LOGGER = logging.getLogger(__name__)
 
+# Step marker for "* | [0]": the first non-null value of an object
+_FIRST_VALUE = "*"
+_RE_STEP = re.compile(r"\[(-?\d+)\]|(\.?)([A-Za-z_][A-Za-z0-9_]*)")
+_RE_STR_FILTER = re.compile(r"\[\?str==sum\(\[`1`,`(-?\d+)`\]\)\]\.val \| \[0\]")
+
+
+def _walk(steps: Tuple[Union[str, int], ...], res: Any) -> Any:
+    """Follow field/index steps through a json body like JMESPath does."""
+    for step in steps:
+        if step == _FIRST_VALUE:
+            if not isinstance(res, dict):
+                return None
+            res = next((v for v in res.values() if v is not None), None)
+        elif isinstance(step, int):
+            if not isinstance(res, list):
+                return None
+            try:
+                res = res[step]
+            except IndexError:
+                return None
+        else:
+            if not isinstance(res, dict):
+                return None
+            res = res.get(step)
+    return res
+
+
+def _first_str_val(strno: int, res: Any) -> Any:
+    """Return the first non-null val of the entry with the given str number."""
+    if not isinstance(res, list):
+        return None
+    for entry in res:
+        if isinstance(entry, dict):
+            strval = entry.get("str")
+            val = entry.get("val")
+            if strval == strno and not isinstance(strval, bool) and val is not None:
+                return val
+    return None
+
+
+def _parse_steps(path: str) -> Optional[Tuple[Union[str, int], ...]]:
+    """Split a simple JMESPath expression into field/index steps.
+
+    Returns None if the expression uses anything else.
+    """
+    steps: List[Union[str, int]] = []
+    pos = 0
+    if path.startswith("* | [0]"):
+        steps.append(_FIRST_VALUE)
+        pos = 7
+    while pos < len(path):
+        match = _RE_STEP.match(path, pos)
+        if match is None:
+            return None
+        if match.group(1) is not None:
+            steps.append(int(match.group(1)))
+        elif bool(match.group(2)) == (pos == 0):
+            # Fields need a leading dot, except at the very beginning
+            return None
+        else:
+            steps.append(match.group(3))
+        pos = match.end()
+    return tuple(steps) if steps else None
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_path(path: str) -> Callable[[Any], Any]:
+    """Compile a JMESPath expression once and return a search function.
+
+    The expressions used by the webconnect sensors are plain field/index
+    lookups, these are answered by a direct dict/list accessor. Everything
+    else is handled by a precompiled JMESPath expression.
+
+    Args:
+        path (str): JMESPath expression
+
+    Returns:
+        Callable[[Any], Any]: Function returning the matching value or None
+    """
+    match = _RE_STR_FILTER.fullmatch(path)
+    if match:
+        return functools.partial(_first_str_val, 1 + int(match.group(1)))
+    steps = _parse_steps(path)
+    if steps:
+        return functools.partial(_walk, steps)
+    return jmespath.compile(path).search
+
+
+_SEARCH_VALID_VALS = _compile_path("* | [0][0].validVals")
+_SEARCH_HIGH = _compile_path("* | [0][0].high")
+_SEARCH_LOW = _compile_path("* | [0][0].low")
+
 
 @dataclass
 class Sensor_Range:
@@ -82,6 +176,18 @@ class Sensor:
             res = self.value
             self.value = None
             return self.value != res
+        return self.decode_value(res, l10n)
+
+    def decode_value(self, res: Any, l10n: Optional[dict] = None) -> bool:
+        """[Webconnect] Decode the value of this sensor from its part of the json body.
+
+        Args:
+            res (Any): json body of the sensor key
+            l10n (dict, optional): Dictionary to translate tags to strings. Defaults to None.
+
+        Returns:
+            bool: The value has changed
+        """
         if not isinstance(self.path, str):
             # Try different methods until we can decode...
             _paths = (
@@ -95,7 +201,7 @@ class Sensor:
             )
             while _paths:
                 _path = _paths.pop()
-                _val = jmespath.search(_path, res)
+                _val = _compile_path(_path)(res)
                 if _val is not None:
                     _LOGGER.debug(
                         "Sensor %s: Will be decoded with %s from %s",
@@ -108,16 +214,16 @@ class Sensor:
 
         # Extract new value
         if isinstance(self.path, str):
-            ret = jmespath.search(self.path, res)
+            ret = _compile_path(self.path)(res)
 
             # Check for Sensor-Range (selection)
-            validVals = jmespath.search("* | [0][0].validVals", res)
+            validVals = _SEARCH_VALID_VALS(res)
             if validVals is not None:
                 self.range = Sensor_Range("selection", validVals, True, self.mapper)
 
             # Check for Sensor-Range (low/high)
-            validHigh = jmespath.search("* | [0][0].high", res)
-            validLow = jmespath.search("* | [0][0].low", res)
+            validHigh = _SEARCH_HIGH(res)
+            validLow = _SEARCH_LOW(res)
             if validHigh is not None and validLow is not None:
                 self.range = Sensor_Range("min/max", [validLow, validHigh], True)
 
@@ -144,10 +250,13 @@ class Sensor:
             ret /= self.factor  # type: ignore
 
         if self.l10n_translate and isinstance(l10n, dict):
-            ret = l10n.get(
-                str(ret),
-                ret,
-            )
+            if isinstance(ret, int) and ret in l10n:
+                ret = l10n[ret]
+            else:
+                ret = l10n.get(
+                    str(ret),
+                    ret,
+                )
 
         try:
             return ret != self.value
@@ -165,7 +274,14 @@ class Sensors:
             sensors (Union[Sensor, List[Sensor], None], optional): One or a list of sensors
                 to add on init. Defaults to None.
         """
-        self.__s: List[Sensor] = []
+        # Sensors are stored by insertion sequence number. The name, key and
+        # (key, key_idx) indexes refer to these sequence numbers, so lookups,
+        # inserts and removals do not need to scan the whole collection.
+        self.__s: Dict[int, Sensor] = {}
+        self.__seq = 0
+        self.__names: Dict[str, int] = {}
+        self.__keys: Dict[str, Dict[int, None]] = {}
+        self.__key_idx: Dict[Tuple[str, int], Dict[int, None]] = {}
 
         if sensors:
             self.add(sensors)
@@ -193,12 +309,7 @@ class Sensors:
                 return False
             key = sen.name
 
-        try:
-            if self[key]:
-                return True
-        except KeyError:
-            pass
-        return False
+        return self.__find(key) is not None
 
     def __getitem__(self, key: str) -> Sensor:
         """Get a sensor.
@@ -212,10 +323,10 @@ class Sensors:
         Returns:
             Sensor: The matching Sensor object
         """
-        for sen in self.__s:
-            if key in (sen.name, sen.key):
-                return sen
-        raise KeyError(key)
+        seq = self.__find(key)
+        if seq is None:
+            raise KeyError(key)
+        return self.__s[seq]
 
     def __iter__(self) -> Iterator[Sensor]:
         """Iterate Sensor objects.
@@ -223,7 +334,31 @@ class Sensors:
         Yields:
             Iterator[Sensor]: Sensor iterator
         """
-        return self.__s.__iter__()
+        return iter(self.__s.values())
+
+    def __find(self, key: str) -> Optional[int]:
+        """Return the sequence number of the first sensor matching name or key."""
+        by_name = self.__names.get(key)
+        by_key = self.__keys.get(key)
+        if not by_key:
+            return by_name
+        first = next(iter(by_key))
+        if by_name is None or first < by_name:
+            return first
+        return by_name
+
+    def __remove(self, seq: int) -> None:
+        """Remove a sensor and its index entries."""
+        sen = self.__s.pop(seq)
+        if sen.name and self.__names.get(sen.name) == seq:
+            del self.__names[sen.name]
+        del self.__keys[sen.key][seq]
+        if not self.__keys[sen.key]:
+            del self.__keys[sen.key]
+        key_idx = (sen.key, sen.key_idx)
+        del self.__key_idx[key_idx][seq]
+        if not self.__key_idx[key_idx]:
+            del self.__key_idx[key_idx]
 
     def add(self, sensor: Union[Sensor, List[Sensor]]) -> None:
         """Add a sensor, logs warning if it exists.
@@ -248,18 +383,49 @@ class Sensors:
         else:
             raise TypeError(f"pysma.Sensor expected {type(sensor)} {sensor}")
 
-        if sensor.name and sensor.name in self:
-            old = self[sensor.name]
-            self.__s.remove(old)
+        if sensor.name and sensor.name in self.__names:
+            old_seq = self.__names[sensor.name]
+            old = self.__s[old_seq]
+            self.__remove(old_seq)
             _LOGGER.warning("Replacing sensor %s with %s", old, sensor)
 
-        if sensor.key in self and self[sensor.key].key_idx == sensor.key_idx:
+        if (sensor.key, sensor.key_idx) in self.__key_idx:
             _LOGGER.warning(
                 "Duplicate SMA sensor key %s (idx: %s)", sensor.key, sensor.key_idx
             )
 
-        self.__s.append(sensor)
+        seq = self.__seq
+        self.__seq += 1
+        self.__s[seq] = sensor
+        if sensor.name:
+            self.__names[sensor.name] = seq
+        self.__keys.setdefault(sensor.key, {})[seq] = None
+        self.__key_idx.setdefault((sensor.key, sensor.key_idx), {})[seq] = None
+
+    def extract_values(
+        self, result_body: dict, l10n: Optional[dict] = None
+    ) -> List[Sensor]:
+        """[Webconnect] Extract the values of all enabled sensors from json body.
+
+        The json body is walked once and every entry is decoded for all
+        sensors sharing its key. Sensors whose key is not part of the body
+        are left untouched.
+
+        Args:
+            result_body (dict): json body retrieved from device
+            l10n (dict, optional): Dictionary to translate tags to strings. Defaults to None.
+
+        Returns:
+            List[Sensor]: Sensors whose value has changed
+        """
+        changed: List[Sensor] = []
+        for key, res in result_body.items():
+            for seq in self.__keys.get(key, ()):
+                sen = self.__s[seq]
+                if sen.enabled and sen.decode_value(res, l10n):
+                    changed.append(sen)
+        return changed
 
     def __str__(self) -> str:
         """Return the dict as string."""
-        return str(self.__s)
+        return str(list(self.__s.values()))
@@ -0,0 +1,127 @@
+"""Test the autodetection of devices."""
+
+import asyncio
+from unittest.mock import patch
+
+from pysma import autoDetect, autoDetectRange
+from pysma.device import DiscoveryInformation
+from pysma.probe import probeAccessMethods, probeSpeedwire, probeTcp
+
+
+async def test_auto_detect_range():
+    """Test the range scan with short timeouts and escalation."""
+    calls = []
+    running = 0
+    maxRunning = 0
+
+    async def detect(method, session, ip, timeout=None):
+        nonlocal running, maxRunning
+        calls.append((ip, method, timeout))
+        running += 1
+        maxRunning = max(maxRunning, running)
+        try:
+            if ip == "10.0.0.2" and method == "webconnect":
+                return [DiscoveryInformation(ip, "found", method)]
+            if ip == "10.0.0.2" and method == "ennexos" and timeout is None:
+                return [DiscoveryInformation(ip, "found", method)]
+            if method == "ennexos":
+                await asyncio.sleep(0.01)
+                di = DiscoveryInformation(ip, "failed", method)
+                di.exception = asyncio.TimeoutError()
+                return [di]
+            await asyncio.sleep(0)
+            return [DiscoveryInformation(ip, "failed", method)]
+        finally:
+            running -= 1
+
+    with patch("pysma._run_detect", detect):
+        found = [
+            (ip, di.access)
+            async for ip, di in autoDetectRange(
+                None,
+                "10.0.0.0/29",
+                maxConcurrency=4,
+                shortTimeout=0.01,
+                accessmethods=["ennexos", "webconnect"],
+                probeTimeout=None,
+            )
+        ]
+
+    assert sorted(found) == [("10.0.0.2", "ennexos"), ("10.0.0.2", "webconnect")]
+    assert maxRunning <= 4
+    # Six hosts with two access methods, only the found host is escalated
+    assert len(calls) == 13
+    assert ("10.0.0.2", "ennexos", None) in calls
+    assert ("10.0.0.3", "ennexos", None) not in calls
+
+    with patch("pysma._run_detect", detect):
+        found = [
+            ip
+            async for ip, _ in autoDetectRange(
+                None, ["10.0.0.2"], accessmethods=["webconnect"], probeTimeout=None
+            )
+        ]
+    assert found == ["10.0.0.2"]
+
+
+class _Echo(asyncio.DatagramProtocol):
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.transport.sendto(data, addr)
+
+
+async def test_probe():
+    """Test the transport probes."""
+    server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    assert await probeTcp("127.0.0.1", port)
+    server.close()
+    await server.wait_closed()
+    assert not await probeTcp("127.0.0.1", port)
+
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        _Echo, local_addr=("127.0.0.1", 0)
+    )
+    port = transport.get_extra_info("sockname")[1]
+    assert await probeSpeedwire("127.0.0.1", 0.5, port)
+    transport.close()
+    assert not await probeSpeedwire("127.0.0.1", 0.1, port)
+
+    async def tcp(ip, port, timeout):
+        return port == 443
+
+    async def udp(ip, timeout, port):
+        return False
+
+    with patch("pysma.probe.probeTcp", tcp), patch("pysma.probe.probeSpeedwire", udp):
+        assert await probeAccessMethods(
+            "10.0.0.2", ["webconnect", "shm2", "speedwireinv", "speedwireem"]
+        ) == {
+            "webconnect": True,
+            "shm2": False,
+            "speedwireinv": False,
+            "speedwireem": True,
+        }
+
+
+async def test_auto_detect_probe():
+    """Test only the answering access methods are detected."""
+    calls = []
+
+    async def probe(ip, accessmethods, timeout):
+        return {m: m in ["webconnect", "speedwireem"] for m in accessmethods}
+
+    async def detect(method, session, ip, timeout=None):
+        calls.append(method)
+        return [DiscoveryInformation(ip, "failed", method)]
+
+    with patch("pysma.probeAccessMethods", probe), patch("pysma._run_detect", detect):
+        ret = await autoDetect(None, "10.0.0.2")
+    assert sorted(calls) == ["speedwireem", "webconnect"]
+    assert len(ret) == 5
+    shm2 = [di for di in ret if di.access == "shm2"][0]
+    assert shm2.status == "failed"
+    assert shm2.remark == "no answer on tcp/502"
@@ -0,0 +1,69 @@
+"""Test the connection pool."""
+
+import ssl
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from pysma.connection_pool import ConnectionPool
+
+
+async def _handler(request):
+    return web.json_response({"ok": 1})
+
+
+def _app():
+    app = web.Application()
+    app.router.add_get("/dummy-url", _handler)
+    return app
+
+
+class Test_connection_pool:
+    """Test the ConnectionPool class."""
+
+    async def test_keep_alive(self, aiohttp_server):
+        """Test connections to the device are reused."""
+        server = await aiohttp_server(_app())
+        session = aiohttp.ClientSession()
+        pool = ConnectionPool(session, 5)
+        pool.set_options({"keepAlive": True, "limitPerHost": 1})
+        for _ in range(3):
+            async with pool.request("GET", str(server.make_url("/dummy-url"))) as res:
+                assert await res.json() == {"ok": 1}
+        assert pool.statistics.requests == 3
+        assert pool.statistics.newConnections == 1
+        assert pool.statistics.reusedConnections == 2
+        await pool.close()
+        assert not session.closed
+        await session.close()
+
+    async def test_caller_session(self):
+        """Test the session of the caller is used without keepAlive."""
+        session = aiohttp.ClientSession()
+        pool = ConnectionPool(session, 5)
+        assert pool._getSession() is session
+        await pool.close()
+        await session.close()
+
+    async def test_self_signed(self, aiohttp_server):
+        """Test the certificate check of the caller is used with keepAlive."""
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(
+            "tests/testdata/selfsigned.pem", "tests/testdata/selfsigned.key"
+        )
+        server = await aiohttp_server(_app(), ssl=context)
+        url = str(server.make_url("/dummy-url"))
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=False))
+        pool = ConnectionPool(session, 5)
+        pool.set_options({"keepAlive": True})
+        async with pool.request("GET", url) as res:
+            assert await res.json() == {"ok": 1}
+        await pool.close()
+
+        pool.set_options({"verifySsl": True})
+        with pytest.raises(aiohttp.ClientConnectorCertificateError):
+            async with pool.request("GET", url):
+                pass
+        await pool.close()
+        await session.close()
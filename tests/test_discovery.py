@@ -0,0 +1,135 @@
+"""Test the speedwire discovery."""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+from pysma.device import DeviceInformation
+from pysma.discovery import DiscoveredDevice, Discovery
+
+RESPONSE = bytes.fromhex("534d4100000402a000000001000200000001")
+
+
+def _connect(discovery, addrs):
+    """Fake socket, that answers the first request after 10 ms per device"""
+    loop = asyncio.get_running_loop()
+    transport = Mock()
+
+    def sendto(data, addr):
+        if transport.sendto.call_count == 1:
+            for i, a in enumerate(addrs):
+                loop.call_later(
+                    0.01 * (i + 1), discovery.datagram_received, RESPONSE, a
+                )
+
+    transport.sendto.side_effect = sendto
+    discovery._open = AsyncMock(
+        side_effect=lambda: discovery.connection_made(transport)
+    )
+    return transport
+
+
+class _Responder(asyncio.DatagramProtocol):
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.transport.sendto(RESPONSE, addr)
+
+
+async def test_discover_adaptive():
+    """Test the discovery ends early."""
+    loop = asyncio.get_running_loop()
+    addrs = [("10.0.0.2", 9522), ("10.0.0.3", 9522)]
+
+    discovery = Discovery(loop)
+    transport = _connect(discovery, addrs)
+    start = loop.time()
+    found = [a async for a in discovery.discover(expected=2)]
+    assert found == addrs
+    assert loop.time() - start < 0.2
+    transport.close.assert_called_once()
+    assert discovery.transport is None
+
+    discovery = Discovery(loop)
+    _connect(discovery, addrs)
+    start = loop.time()
+    found = [a async for a in discovery.discover(quietPeriod=0.1)]
+    assert found == addrs
+    assert loop.time() - start < 0.3
+    # Ignore other packets
+    discovery.datagram_received(b"SMA\x00" + bytes(14), addrs[0])
+    assert discovery.discovered == addrs
+
+
+async def test_discover_retries():
+    """Test the requests are repeated until a device answers."""
+    loop = asyncio.get_running_loop()
+    discovery = Discovery(loop)
+    discovery.REQUEST_INTERVAL = 0.05
+    transport = _connect(discovery, [])
+    found = [a async for a in discovery.discover(quietPeriod=0.3)]
+    assert found == []
+    assert transport.sendto.call_count == Discovery.REQUESTS
+
+    discovery = Discovery(loop)
+    discovery.REQUEST_INTERVAL = 0.05
+    transport = _connect(discovery, [("10.0.0.2", 9522)])
+    found = [a async for a in discovery.discover(quietPeriod=0.3)]
+    assert found == [("10.0.0.2", 9522)]
+    assert transport.sendto.call_count == 1
+
+
+async def test_discover_quiet_period():
+    """Test the quiet period starts with the last answer."""
+    loop = asyncio.get_running_loop()
+    discovery = Discovery(loop)
+    _connect(discovery, [("10.0.0.2", 9522)])
+    start = loop.time()
+    found = [a async for a in discovery.discover()]
+    assert found == [("10.0.0.2", 9522)]
+    assert loop.time() - start < 2.0
+
+
+async def test_discover_ephemeral_port():
+    """Test the replies are received on the socket of the request."""
+    loop = asyncio.get_running_loop()
+    responder, _ = await loop.create_datagram_endpoint(
+        _Responder, local_addr=("127.0.0.1", 0)
+    )
+    discovery = Discovery(loop)
+    discovery.addr, discovery.port = responder.get_extra_info("sockname")
+    try:
+        found = [a async for a in discovery.discover(expected=1, timeout=1)]
+    finally:
+        responder.close()
+    assert found == [(discovery.addr, discovery.port)]
+
+
+async def test_discover_identify():
+    """Test the discovered devices are identified in parallel."""
+    loop = asyncio.get_running_loop()
+    addrs = [("10.0.0.2", 9522), ("10.0.0.3", 9522)]
+    discovery = Discovery(loop)
+    _connect(discovery, addrs)
+
+    async def identify(addr, password, group):
+        assert (password, group) == ("secret", "installer")
+        await asyncio.sleep(0.1)
+        info = DeviceInformation(addr[0], addr[0], "STP", "Inverter", "SMA", "")
+        return DiscoveredDevice(addr, info)
+
+    with patch.object(discovery, "identify", identify):
+        start = loop.time()
+        devices = await discovery.runAdaptive(
+            expected=2, password="secret", group="installer"
+        )
+        assert loop.time() - start < 0.2
+    assert [d.addr for d in devices] == addrs
+    assert devices[1].device.serial == "10.0.0.3"
+
+    # Without password the devices are not identified
+    discovery = Discovery(loop)
+    _connect(discovery, addrs)
+    with patch.object(discovery, "identify", identify):
+        devices = await discovery.runAdaptive(expected=2)
+    assert devices == [DiscoveredDevice(a) for a in addrs]
@@ -1,20 +1,28 @@
 """Test pysma init."""
 import asyncio
-import logging
-from unittest.mock import patch
+import base64
 import json
+import logging
+import time
+from unittest.mock import Mock, patch
 
 import aiohttp
 import pytest
-import base64
-import time
-from pysma.device_em import SMAspeedwireEM
+from aioresponses import aioresponses
+
+from pysma.definitions_em import obis2sensor
+from pysma.device_em import (
+    SMAspeedwireEM,
+    SpeedwireMulticastListener,
+    decodePacket,
+    obisChannels,
+)
 from pysma.exceptions import (
     SmaAuthenticationException,
     SmaConnectionException,
     SmaReadException,
 )
-from aioresponses import aioresponses
+
 from . import MOCK_DEVICE, MOCK_L10N, mock_aioresponse
 
 _LOGGER = logging.getLogger(__name__)
@@ -59,3 +67,131 @@ class Test_SMAEM_class:
             print(debug)
             assert debug["last_packet"] == debug["last_valid_packet"] == data["packet"]  
 
+
+    async def test_decode(self) -> None:
+         """ Checks the table driven decoding of the OBIS channels. """
+         sma = SMAspeedwireEM()
+         with open("tests/testdata/SunnyHomeManager2.json", "r") as file:
+            packet = base64.b64decode(json.load(file)["packet"])
+         assert len(obisChannels) == len(obis2sensor)
+         data = sma.datagram_received(packet, ("192.0.2.1", 9522))
+         assert data["14:4:0"] == 49978 / 1000
+         assert data["1:8:0"] == 20540962440 / 3600000
+         assert data["3:4:0"] is not None
+         assert data["sw_version"] == "2.13.6.R"
+         sensors = await sma.get_sensors()
+         sma._get_next_values = lambda deviceID=None: asyncio.sleep(0, data)  # type: ignore[method-assign]
+         await sma.read(sensors)
+         assert sensors["metering_frequency"].value == 49.978
+
+    async def test_subscription(self) -> None:
+         """ Concurrent reads for different meters get their own packets. """
+         sma = SMAspeedwireEM()
+         with open("tests/testdata/SunnyHomeManager2.json", "r") as file:
+            packet = base64.b64decode(json.load(file)["packet"])
+         packets = {
+            serial: packet[:20] + serial.to_bytes(4, "big") + packet[24:]
+            for serial in [1001, 1002]
+         }
+         reader1 = asyncio.create_task(sma._get_next_values("1001"))
+         reader2 = asyncio.create_task(sma._get_next_values("1002"))
+         anyreader = asyncio.create_task(sma._get_next_values())
+         await asyncio.sleep(0)
+         sma.datagram_received(packets[1002], ("192.0.2.2", 9522))
+         sma.datagram_received(packets[1001], ("192.0.2.1", 9522))
+         assert (await reader1)["serial"] == 1001
+         assert (await reader2)["serial"] == 1002
+         assert (await anyreader)["serial"] == 1002
+         assert sma._waiters == {}
+         assert set(sma._latest) == {"1001", "1002"}
+
+    async def test_max_age(self) -> None:
+         """ Fresh values are read from the cache. """
+         sma = SMAspeedwireEM()
+         with open("tests/testdata/SunnyHomeManager2.json", "r") as file:
+            packet = base64.b64decode(json.load(file)["packet"])
+         sma.datagram_received(packet, ("192.0.2.1", 9522))
+         sensors = await sma.get_sensors()
+         assert sma._get_cached_values() is None
+         sma.set_options({"maxAge": 5})
+         await asyncio.wait_for(sma.read(sensors, "3014930442"), timeout=0.1)
+         await asyncio.wait_for(sma.read(sensors), timeout=0.1)
+         assert sensors["metering_frequency"].value == 49.978
+         assert sma._get_cached_values("1001") is None
+         sma._latest["3014930442"] = (time.monotonic() - 6, sma._latest["3014930442"][1])
+         assert sma._get_cached_values("3014930442") is None
+
+    async def test_shared_listener(self) -> None:
+         """ All energy meters share one multicast listener. """
+         with open("tests/testdata/SunnyHomeManager2.json", "r") as file:
+            packet = base64.b64decode(json.load(file)["packet"])
+         sma1 = SMAspeedwireEM()
+         sma2 = SMAspeedwireEM()
+         listener = await SpeedwireMulticastListener.attach(sma1)
+         assert await SpeedwireMulticastListener.attach(sma2) is listener
+         sma1._listener = sma2._listener = listener
+         with patch("pysma.device_em.decodePacket", wraps=decodePacket) as decoder:
+            listener.datagram_received(packet, ("192.0.2.1", 9522))
+            listener.datagram_received(packet, ("192.0.2.1", 9522))
+            assert decoder.call_count == 2
+         assert sma1.di.last_data is sma2.di.last_data
+         assert sma1.di.last_data["sw_version"] == "2.13.6.R"
+         await sma1.close_session()
+         assert SpeedwireMulticastListener._instance is listener
+         await sma2.close_session()
+         assert SpeedwireMulticastListener._instance is None
+
+    async def test_shared_listener_failure(self) -> None:
+         """ Concurrent subscribers get the error, if the socket can not be opened. """
+         loop = asyncio.get_running_loop()
+
+         async def fail(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            raise OSError("no network")
+
+         with patch.object(loop, "create_datagram_endpoint", side_effect=fail):
+            results = await asyncio.wait_for(
+               asyncio.gather(
+                  SpeedwireMulticastListener.attach(SMAspeedwireEM()),
+                  SpeedwireMulticastListener.attach(SMAspeedwireEM()),
+                  return_exceptions=True,
+               ),
+               timeout=1,
+            )
+         assert all(isinstance(r, OSError) for r in results)
+         assert SpeedwireMulticastListener._instance is None
+         listener = await SpeedwireMulticastListener.attach(SMAspeedwireEM())
+         listener.close()
+
+    async def test_stream(self) -> None:
+         """ Frames are streamed with drop-oldest or coalesce buffers. """
+         with open("tests/testdata/SunnyHomeManager2.json", "r") as file:
+            packet = base64.b64decode(json.load(file)["packet"])
+         sma = SMAspeedwireEM()
+         sma._listener = Mock()
+
+         def send(serial: int, timestamp: int) -> None:
+            sma.datagram_received(
+               packet[:20] + serial.to_bytes(4, "big") + timestamp.to_bytes(4, "big") + packet[28:],
+               (f"192.0.2.{serial % 1000}", 9522),
+            )
+
+         stream = sma.stream(serials=[1001], maxsize=2)
+         latest = sma.stream(coalesce=True)
+         first = asyncio.create_task(anext(stream))
+         firstLatest = asyncio.create_task(anext(latest))
+         await asyncio.sleep(0)
+         send(1001, 1)
+         frame = await first
+         assert frame.serial == 1001 and frame.values["14:4:0"] == 49.978
+         assert (await firstLatest).serial == 1001
+         for timestamp in range(2, 5):
+            send(1001, timestamp)
+            send(1002, timestamp)
+         assert [(await anext(stream)).serial for _ in range(2)] == [1001, 1001]
+         assert sma._streams[0].dropped == 1
+         assert [(await anext(latest)).serial for _ in range(2)] == [1001, 1002]
+         assert sma._streams[1].dropped == 4
+         await stream.aclose()
+         await latest.aclose()
+         assert sma._streams == []
@@ -8,6 +8,7 @@ import aiohttp
 import pytest
 
 from pysma.device_ennexos import SMAennexos
+from pysma.sensor import Sensor, Sensors
 from pysma.exceptions import (
     SmaAuthenticationException,
     SmaConnectionException,
@@ -237,3 +238,192 @@ class Test_SMA_class:
         debug = await sma.get_debug()
         await session.close()
 
+
+    async def test_read_many(self, mock_aioresponse):
+        """ All devices are read with one request per endpoint """
+        measurements = self.loadJson("TripowerX15-measurements.json")
+        evcharger = [
+            dict(m, componentId="Plant:1/ev") for m in self.loadJson("EVCharger-measurements.json")
+        ]
+        parameters = self.loadJson("TripowerX15-parameters.json")
+        mock_aioresponse.post(
+            "https://localhost/api/v1/parameters/search",
+            payload=parameters + [{"componentId": "Plant:1/ev", "values": []}],
+        )
+        mock_aioresponse.post(
+            "https://localhost/api/v1/measurements/live",
+            payload=measurements + evcharger,
+        )
+        session = aiohttp.ClientSession()
+        sma = SMAennexos(session, "localhost", "pass", "user")
+        sma.set_options({"maxConcurrency": 1})
+        sma._authorization_header = {}
+        inverter = Sensors([Sensor("Coolsys.Inverter.TmpVal.1", "temp_1")])
+        charger = Sensors([Sensor("ChaSess.WhIn", "charged")])
+        assert await sma.read_many({"IGULD:SELF": inverter, "Plant:1/ev": charger})
+        assert inverter["temp_1"].value == 43.08
+        assert charger["charged"].value is not None
+        assert len(mock_aioresponse.requests) == 2
+        await session.close()
+
+    async def test_parameter_interval(self, mock_aioresponse):
+        """ Parameters are requested again after the interval or an invalidation """
+        mock_aioresponse.post(
+            "https://localhost/api/v1/parameters/search",
+            payload=self.loadJson("TripowerX15-parameters.json"),
+            repeat=True,
+        )
+        mock_aioresponse.post(
+            "https://localhost/api/v1/measurements/live",
+            payload=self.loadJson("TripowerX15-measurements.json"),
+            repeat=True,
+        )
+        session = aiohttp.ClientSession()
+        sma = SMAennexos(session, "localhost", "pass", "user")
+        sma.set_options({"parameterInterval": 60})
+        sma._authorization_header = {}
+        sensors = Sensors([Sensor("Coolsys.Inverter.TmpVal.1", "temp_1")])
+
+        def count(endpoint: str) -> int:
+            return sum(
+                len(calls)
+                for (method, url), calls in mock_aioresponse.requests.items()
+                if url.path.endswith(endpoint)
+            )
+
+        await sma.read(sensors)
+        await sma.read(sensors)
+        assert count("/measurements/live") == 2
+        assert count("/parameters/search") == 1
+        sma.invalidate_parameters("IGULD:SELF")
+        await sma.read(sensors)
+        assert count("/parameters/search") == 2
+        await session.close()
+
+    async def test_live_channels(self, mock_aioresponse):
+        """ Only the channels of the sensors are requested after the first read """
+        measurements = self.loadJson("TripowerX15-measurements.json")
+        mock_aioresponse.post(
+            "https://localhost/api/v1/parameters/search",
+            payload=self.loadJson("TripowerX15-parameters.json"),
+            repeat=True,
+        )
+        mock_aioresponse.post(
+            "https://localhost/api/v1/measurements/live",
+            payload=measurements,
+        )
+        mock_aioresponse.post(
+            "https://localhost/api/v1/measurements/live",
+            payload=[m for m in measurements if m["channelId"] == "Measurement.Coolsys.Inverter.TmpVal[]"],
+        )
+        session = aiohttp.ClientSession()
+        sma = SMAennexos(session, "localhost", "pass", "user")
+        sma._authorization_header = {}
+        sensors = Sensors([
+            Sensor("Coolsys.Inverter.TmpVal.1", "temp_1"),
+            Sensor("Coolsys.Inverter.TmpVal.2", "temp_2"),
+            Sensor("Unknown.Channel", "unknown"),
+        ])
+        await sma.read(sensors)
+        await sma.read(sensors)
+        calls = [
+            json.loads(call.kwargs["data"])
+            for (method, url), c in mock_aioresponse.requests.items()
+            if url.path.endswith("/measurements/live")
+            for call in c
+        ]
+        assert calls == [
+            [{"componentId": "IGULD:SELF"}],
+            [{"componentId": "IGULD:SELF", "channelId": "Measurement.Coolsys.Inverter.TmpVal[]"}],
+        ]
+        assert sensors["temp_2"].value == 43.7
+        await session.close()
+
+    async def test_live_channels_refresh(self, mock_aioresponse):
+        """Channels missing in the first read are searched again."""
+        measurements = self.loadJson("TripowerX15-measurements.json")
+        channel = "Measurement.Coolsys.Inverter.TmpVal[]"
+        mock_aioresponse.post(
+            "https://localhost/api/v1/parameters/search",
+            payload=self.loadJson("TripowerX15-parameters.json"),
+            repeat=True,
+        )
+        # The channel is not available while the device starts up
+        mock_aioresponse.post(
+            "https://localhost/api/v1/measurements/live",
+            payload=[m for m in measurements if m["channelId"] != channel],
+        )
+        mock_aioresponse.post(
+            "https://localhost/api/v1/measurements/live",
+            payload=measurements,
+        )
+        mock_aioresponse.post(
+            "https://localhost/api/v1/measurements/live",
+            payload=[m for m in measurements if m["channelId"] == channel],
+        )
+        session = aiohttp.ClientSession()
+        sma = SMAennexos(session, "localhost", "pass", "user")
+        sma._authorization_header = {}
+        sma.set_options({"liveChannelInterval": 0})
+        sensors = Sensors([Sensor("Coolsys.Inverter.TmpVal.2", "temp_2")])
+        await sma.read(sensors)
+        assert sensors["temp_2"].value is None
+        await sma.read(sensors)
+        assert sensors["temp_2"].value == 43.7
+        await sma.read(sensors)
+        calls = [
+            json.loads(call.kwargs["data"])
+            for (method, url), c in mock_aioresponse.requests.items()
+            if url.path.endswith("/measurements/live")
+            for call in c
+        ]
+        assert calls == [
+            [{"componentId": "IGULD:SELF"}],
+            [{"componentId": "IGULD:SELF"}],
+            [{"componentId": "IGULD:SELF", "channelId": channel}],
+        ]
+        await session.close()
+
+    async def test_token_refresh(self, mock_aioresponse):
+        """ The token is renewed with the refresh token, without plant requests """
+        mock_aioresponse.post(
+            "https://localhost/api/v1/token",
+            payload={"access_token": "first", "refresh_token": "r1", "expires_in": 900},
+        )
+        mock_aioresponse.post(
+            "https://localhost/api/v1/token",
+            payload={"access_token": "second", "refresh_token": "r2", "expires_in": 900},
+        )
+        mock_aioresponse.get("https://localhost/api/v1/plants/Plant:1", payload={})
+        mock_aioresponse.get("https://localhost/api/v1/plants/Plant:1/devices", payload=[])
+        mock_aioresponse.get("https://localhost/api/v1/featuretoggles", payload={})
+        mock_aioresponse.post(
+            "https://localhost/api/v1/measurements/live", payload=[], repeat=True
+        )
+        mock_aioresponse.post(
+            "https://localhost/api/v1/parameters/search", payload=[], repeat=True
+        )
+        session = aiohttp.ClientSession()
+        sma = SMAennexos(session, "localhost", "pass", "user")
+        await sma.new_session()
+        assert sma._authorization_header["Authorization"] == "Bearer first"
+        assert sma._tokenRefreshTask is not None
+        # Token expired, e.g. after a suspend
+        sma._tokenExpires = 0
+        await sma.read(Sensors())
+        assert sma._authorization_header["Authorization"] == "Bearer second"
+        tokenCalls = [
+            call.kwargs["data"]
+            for (method, url), calls in mock_aioresponse.requests.items()
+            if url.path.endswith("/token")
+            for call in calls
+        ]
+        assert tokenCalls[-1] == {"grant_type": "refresh_token", "refresh_token": "r1"}
+        plantCalls = [
+            url for (method, url), calls in mock_aioresponse.requests.items()
+            if method == "GET" for call in calls
+        ]
+        assert len(plantCalls) == 3
+        await sma.close_session()
+        assert sma._tokenRefreshTask is None
+        await session.close()
@@ -3,16 +3,19 @@ import logging
 from json import loads
 from unittest.mock import patch
 
+import jmespath
 import pytest
 
 from pysma.const_webconnect import (
     GENERIC_SENSORS,
     JMESPATH_VAL,
     JMESPATH_VAL_IDX,
+    JMESPATH_VAL_IDX_TAG,
     JMESPATH_VAL_STR,
+    JMESPATH_VAL_TAG,
 )
 from pysma.definitions_webconnect import sensor_map
-from pysma.sensor import Sensor, Sensors
+from pysma.sensor import Sensor, Sensors, _compile_path
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -102,6 +105,37 @@ class Test_sensor_class:
         sens = Sensor("6100_40263F00", "s_null", "kWh")
         assert sens.extract_value({"6100_40263F00": None}) is False
 
+    @pytest.mark.parametrize(
+        "path",
+        [
+            JMESPATH_VAL,
+            JMESPATH_VAL_TAG,
+            JMESPATH_VAL_STR.format(0),
+            JMESPATH_VAL_STR.format(1),
+            JMESPATH_VAL_IDX.format(1),
+            JMESPATH_VAL_IDX.format(-1),
+            JMESPATH_VAL_IDX_TAG.format(0),
+            "* | [0][0].validVals",
+            "[?val].str",
+        ],
+    )
+    def test_compiled_path(self, path):
+        """Compiled paths must return the same as jmespath.search."""
+        search = _compile_path(path)
+        for body in [
+            None,
+            1,
+            [],
+            {},
+            {"val": [{"tag": 307}]},
+            {"1": None, "2": [{"val": [{"tag": 307}]}, {"val": 5}]},
+            {"1": [{"validVals": [302, 303]}]},
+            {"1": {"0": 1}},
+            SB_2_5["6380_40251E00"],
+            [{"str": 1, "val": None}, {"str": 1, "val": 3}, {"str": True, "val": 4}],
+        ] + list(SB_1_5.values()):
+            assert search(body) == jmespath.search(path, body)
+
 
 class Test_sensors_class:
     """Test the Sensors class."""
@@ -143,3 +177,46 @@ class Test_sensors_class:
         for sen in sens:
             sen.extract_value(SB_1_5)
         assert mock_warn.called
+
+    @patch("pysma.sensor._LOGGER.warning")
+    def test_lookup_and_order(self, mock_warn):
+        """Ensure lookups follow the replaced sensors and order is kept."""
+        sen = Sensors(
+            [Sensor("key1", "s1", ""), Sensor("key2", "s2", ""), Sensor("key3", "s3")]
+        )
+        assert [s.name for s in sen] == ["s1", "s2", "s3"]
+        assert sen["key2"].name == "s2"
+        assert sen["s3"].key == "key3"
+
+        # Replacing a sensor moves it to the end and updates the key index
+        sen.add(Sensor("key4", "s2", ""))
+        assert [s.name for s in sen] == ["s1", "s3", "s2"]
+        assert "key2" not in sen
+        assert sen["key4"].name == "s2"
+        assert len(sen) == 3
+
+        # Name or key lookups return the first matching sensor
+        sen.add(Sensor("s1", "s5", ""))
+        assert sen["s1"].key == "key1"
+        with pytest.raises(KeyError):
+            sen["unknown"]
+
+    def test_extract_values(self, sensors):
+        """Test decoding all sensors in one pass."""
+        sens = Sensors([sen for _, _, sen in sensors])
+        sens.add(Sensor("6100_40263F00", "s_null", "W"))
+        sens.add(Sensor("6100_00000000", "s_missing", "W"))
+        sens["s_3514"].enabled = False
+
+        changed = sens.extract_values(SB_2_5)
+        assert [sen.name for sen in changed] == [
+            "s_402",
+            "s_null",
+            "pv_power_a",
+            "pv_power_b",
+        ]
+        assert sens["s_null"].value == 0
+        assert sens["s_3514"].value is None
+        assert sens["s_missing"].value is None
+        assert sens["pv_power_b"].value == 522
+        assert sens.extract_values(SB_2_5) == []
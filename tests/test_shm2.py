@@ -0,0 +1,93 @@
+"""Test the Sunny Home Manager 2 via modbus."""
+
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from pysma.const import Identifier
+from pysma.device_shm2 import SHM2, modusbus2sensor, planModbusBlocks
+from pysma.exceptions import SmaReadException
+from pysma.sensor import Sensor
+
+
+def _registers(values):
+    """Modbus registers of u32 values"""
+    ret = []
+    for v in values:
+        v &= 0xFFFFFFFF
+        ret.extend([v >> 16, v & 0xFFFF])
+    return ret
+
+
+def _response(registers=None):
+    ret = Mock()
+    ret.isError.return_value = registers is None
+    ret.registers = registers
+    return ret
+
+
+def test_plan_modbus_blocks():
+    """Test the registers are grouped to contiguous blocks per slave."""
+    defs = [
+        modusbus2sensor(addr, slave, fmt, Sensor(str(addr), str(addr)))
+        for addr, slave, fmt in [
+            (30583, 2, "u32"),
+            (30581, 2, "u32"),
+            (30201, 2, "u32"),
+            (30585, 3, "s32"),
+            (30587, 3, "u32"),
+        ]
+    ]
+    blocks = planModbusBlocks(defs)
+    assert [(b.slaveid, b.addr, b.count) for b in blocks] == [
+        (2, 30201, 2),
+        (2, 30581, 4),
+        (3, 30585, 4),
+    ]
+    assert len(planModbusBlocks(defs, maxCount=2)) == 5
+
+
+async def test_read():
+    """Test the sensors are read with one request per block."""
+    shm = SHM2("1.1.1.1", None)
+    shm._client = Mock()
+    blocks = {
+        (30201, 2): _registers([307]),
+        (30581, 4): _registers([1234000, 5678000]),
+        (30865, 4): _registers([100, 0]),
+    }
+    shm._client.read_holding_registers = AsyncMock(
+        side_effect=lambda addr, count, device_id: _response(blocks[(addr, count)])
+    )
+    sensors = await shm.get_sensors()
+    await shm.read(sensors)
+    assert shm._client.read_holding_registers.await_count == 3
+    assert sensors[Identifier.metering_total_absorbed].value == 1234
+    assert sensors[Identifier.metering_total_yield].value == 5678
+    assert sensors[Identifier.metering_power_absorbed].value == 100
+    assert sensors[Identifier.operating_status_genereal].mapped_value == "OK"
+    assert sensors[Identifier.power_setpoint_plant_control].value is None
+
+    # Unsupported register in a block, read one by one
+    blocks[(30581, 2)] = _registers([1])
+    blocks[(30583, 2)] = _registers([2000])
+    blocks[(30581, 4)] = None
+    await shm.read(sensors)
+    assert sensors[Identifier.metering_total_yield].value == 2
+
+    blocks[(30201, 2)] = None
+    with pytest.raises(SmaReadException):
+        await shm.read(sensors)
+
+
+async def test_read_modbus_s32():
+    """Test the value formats."""
+    shm = SHM2("1.1.1.1", None)
+    shm._client = Mock()
+    shm._client.read_holding_registers = AsyncMock(
+        return_value=_response(_registers([-5]))
+    )
+    assert await shm.read_modbus(40149, 2, "s32") == -5
+    assert await shm.read_modbus(40149, 2, "u32") == 0xFFFFFFFB
+    with pytest.raises(ValueError):
+        await shm.read_modbus(40149, 2, "u64")
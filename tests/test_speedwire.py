@@ -1,11 +1,22 @@
-from pysma.definitions_speedwire import commands, responseDef
-from typing import List, Tuple
-from pysma.device_speedwire import SMAspeedwireINV
-import json
+import asyncio
 import base64
+import json
 import logging
+import struct
 import sys
-import asyncio
+import time
+from typing import List, Tuple
+
+from pysma.definitions_speedwire import commands, responseDef, sensorKey2command
+from pysma.device_speedwire import (
+    ResponseHandler,
+    SMAClientProtocol,
+    SMAspeedwireINV,
+    coalesce_commands,
+    responseHandlers,
+)
+from pysma.sensor import Sensor, Sensors
+
 
 class Test_speedwire_class:
     """Test the Speedwire class."""
@@ -28,6 +39,171 @@ class Test_speedwire_class:
             assert len(sma._protocol.sensors)
             assert len(debug["msg"]) == msgcounter
 
+    async def test_keep_alive(self) -> None:
+        """ Test that a kept alive session is reused and refreshed """
+        class FakeTransport:
+            def sendto(self, data: bytes) -> None:
+                pass
+
+        loop = asyncio.get_running_loop()
+        protocol = SMAClientProtocol(
+            "xyz", loop.create_future(), {"keepAlive": True, "commandTimeout": 0.01}
+        )
+        protocol.connection_made(FakeTransport())
+        for loggedIn, loginAge, expected in [
+            (False, 0, ["login", "TypeLabel"]),
+            (True, 10, ["TypeLabel"]),
+            (True, 5000, ["login", "TypeLabel"]),
+        ]:
+            protocol._loggedIn = loggedIn
+            protocol._loginTime = time.time() - loginAge
+            await protocol.start_query(["TypeLabel"], loop.create_future(), "user")
+            assert protocol.cmds == expected
+            protocol.future = None
+        await asyncio.sleep(0.05)
+
+    async def test_pipeline(self) -> None:
+        """ Test pipelined commands with a device that answers every request with a NACK """
+        loop = asyncio.get_running_loop()
+
+        class EchoTransport:
+            sent = 0
+
+            def sendto(self, data: bytes) -> None:
+                self.sent += 1
+                if self.sent == 1:
+                    return  # Lose the first request, it must be resent
+                loop.call_soon(protocol.datagram_received, data, ("192.0.2.1", 9522))
+
+        protocol = SMAClientProtocol(
+            "xyz", loop.create_future(), {"pipeline": 8, "commandTimeout": 0.05}
+        )
+        transport = EchoTransport()
+        protocol.connection_made(transport)
+        protocol._loggedIn = True
+        resends = protocol.debug["resendcounter"]
+        fut = loop.create_future()
+        await protocol.start_query(protocol.allCmds, fut, "user")
+        await asyncio.wait_for(fut, timeout=2)
+        assert protocol._failedCounter == 0
+        assert protocol._sendCounter == len(protocol.allCmds)
+        assert protocol.debug["resendcounter"] == resends + 1
+        assert len(protocol._pending) == 0
+        # all commands, one resend and the logoff
+        assert transport.sent == len(protocol.allCmds) + 2
+
+    async def test_pipeline_timeout(self) -> None:
+        """ Test that a timed out pipelined query does not finish the next one """
+        loop = asyncio.get_running_loop()
+
+        class SilentTransport:
+            answer = False
+
+            def sendto(self, data: bytes) -> None:
+                if self.answer:
+                    loop.call_soon(protocol.datagram_received, data, ("192.0.2.1", 9522))
+
+        protocol = SMAClientProtocol(
+            "xyz", loop.create_future(), {"pipeline": 8, "commandTimeout": 0.05}
+        )
+        transport = SilentTransport()
+        protocol.connection_made(transport)
+        protocol._loggedIn = True
+        first = loop.create_future()
+        await protocol.start_query(["TypeLabel"], first, "user")
+        try:
+            await asyncio.wait_for(first, timeout=0.02)
+        except asyncio.TimeoutError:
+            pass
+        old = protocol._pipelineTask
+        transport.answer = True
+        second = loop.create_future()
+        await protocol.start_query(["TypeLabel"], second, "user")
+        assert old is not None and old.cancelled()
+        assert protocol.future is second
+        assert protocol.cmds == ["TypeLabel"]
+        await asyncio.wait_for(second, timeout=2)
+        assert protocol._failedCounter == 0
+        assert len(protocol._pending) == 0
+
+    async def test_coalesce_commands(self) -> None:
+        """ Test that merged queries cover all requested register ranges """
+        cmds = [c for c in commands if c not in ["login", "logoff"]]
+        queries = coalesce_commands(cmds, 16)
+        assert len(queries) < len(cmds)
+        assert queries["SpotBatteryLoad+SpotBatteryUnload"]["last"] == 0x004968FF
+        for name in cmds:
+            c = commands[name]
+            assert any(
+                q["command"] == c["command"]
+                and q["first"] <= c["first"]
+                and c["last"] <= q["last"]
+                for q in queries.values()
+            )
+        assert list(coalesce_commands(["TypeLabel"], 16)) == ["TypeLabel"]
+
+    async def test_selective_read(self) -> None:
+        """ Test that only the commands for the enabled sensors are sent """
+        sma = SMAspeedwireINV(host="192.0.2.1", password="xyz", group="user")
+        sma._protocol = SMAClientProtocol(
+            "xyz", asyncio.get_running_loop().create_future(), {}
+        )
+        sensors = Sensors(
+            [
+                Sensor("grid_power", "grid_power"),
+                Sensor("total", "total_yield"),
+                Sensor("today", "daily_yield"),
+                Sensor("spot_dc_voltage1", "pv_voltage_a"),
+                Sensor("unknown", "unknown"),
+            ]
+        )
+        sensors["pv_voltage_a"].enabled = False
+        assert sma._commands_for(sensors) == ["EnergyProduction", "SpotACTotalPower"]
+        for code, handlers in responseDef.items():
+            for handler in handlers:
+                sensor = handler.get("sensor")
+                if isinstance(sensor, Sensor):
+                    c = commands[sensorKey2command[sensor.key]]
+                    assert c["first"] & 0xFFFF00 <= int(code, 16) & 0xFFFF00
+                    assert int(code, 16) & 0xFFFF00 <= c["last"] & 0xFFFF00
+
+    async def test_response_handler(self) -> None:
+        """ Test the compiled register decoders """
+        assert set(responseHandlers) == {int(code, 16) for code in responseDef}
+        header = bytes(8)
+        handler = ResponseHandler.fromDefinition({"format": "int"})
+        subdata = header + struct.pack("<3l", -5, -0x80000000, 7)
+        assert handler.extractvalues(subdata) == [-5, None, 7]
+        handler = ResponseHandler.fromDefinition({"mask": 0xFF})
+        subdata = header + struct.pack("<2L", 0x1234, 0xFFFFFFFF)
+        assert handler.extractvalues(subdata) == [0x34, None]
+        (handler,) = responseHandlers[0x00823401]
+        assert handler.converter is not None and not handler.overwrite
+        subdata = header + struct.pack("<5L", 0, 0, 0, 0, 0x03051204)
+        assert handler.extractvalues(subdata)[4] == handler.converter(0x03051204)
+
+    async def test_fix_id(self) -> None:
+        """ Test the resolution of response codes """
+        protocol = SMAClientProtocol("xyz", asyncio.get_running_loop().create_future(), {})
+        assert protocol.fixID(0x00823401) == 0x00823401
+        assert protocol.fixID(0x00823404) == 0x00823401
+        assert protocol.fixID(0x12345678) == 0x12345678
+        for code in responseDef:
+            assert protocol.fixID(int(code, 16)) == int(code, 16)
+
+    async def test_debug_msg(self) -> None:
+        """ Test that received packets are rendered only for the debug output """
+        sma = SMAspeedwireINV(host="192.0.2.1", password="xyz", group="user")
+        sma._protocol = SMAClientProtocol(
+            "xyz", asyncio.get_running_loop().create_future(), {}
+        )
+        sma._deviceinfo = None  # type: ignore[assignment]
+        packet = bytes.fromhex("534d4100000402a000000001002600106065")
+        sma._protocol.datagram_received(packet, ("192.0.2.1", 9522))
+        assert sma._protocol.debug["msg"][-1][2] is packet
+        debug = await sma.get_debug()
+        assert debug["msg"][-1][:3] == ["RECV", len(packet), packet.hex().upper()]
+
     async def test_unique_responses(self) -> None:
         """ Test if no command is overlapping """
         ll:List[Tuple] = []
@@ -8,14 +8,16 @@ import aiohttp
 import pytest
 
 from pysma import SMA
+from pysma.const_webconnect import JMESPATHS_TAG
 from pysma.definitions_webconnect import device_type as device_type_sensor
 from pysma.exceptions import (
     SmaAuthenticationException,
     SmaConnectionException,
     SmaReadException,
 )
-from pysma.sensor import Sensors
+from pysma.sensor import Sensor, Sensors
 from pysma.device_webconnect import SMAwebconnect
+from pysma.l10n_cache import L10nCache, l10nCache
 
 from . import MOCK_DEVICE, MOCK_L10N, SMA_TESTDATA, mock_aioresponse  # noqa: F401
 
@@ -29,6 +31,7 @@ class Test_SMA_class:
     def _setup(self, mock_aioresponse):  # noqa: F811
         self.host = "1.1.1.1"
         self.base_url = f"http://{self.host}"
+        l10nCache.clear()
         mock_aioresponse.get(
             re.compile(f"{self.base_url}/data/l10n/en-US.json.*"),
             payload=MOCK_L10N,
@@ -469,3 +472,80 @@ class Test_SMA_class:
         await sma._read_l10n()
         assert mock_warn.call_count == 1
         assert len(sma._l10n) > 0
+
+    async def test_shared_l10n(self, mock_aioresponse, tmp_path):  # noqa: F811
+        """Test the l10n file is read once for all devices."""
+        session = aiohttp.ClientSession()
+        sma1 = SMAwebconnect(session, self.host, "pass")
+        sma2 = SMAwebconnect(session, self.host, "pass")
+        l10n1, l10n2 = await asyncio.gather(
+            sma1._read_l10n("3.10.28.R"), sma2._read_l10n("3.10.28.R")
+        )
+        assert l10n1 is l10n2
+        assert l10n1[461] == "SMA"
+        assert self._l10n_requests(mock_aioresponse) == 1
+
+        sens = Sensor("6800_08822000", "t", path="val[0].tag", l10n_translate=True)
+        assert sens.decode_value({"val": [{"tag": 9402}]}, l10n1)
+        assert sens.value == "Sunny Boy 3.6"
+
+        # Without firmware the file is not shared
+        await sma1._read_l10n()
+        assert self._l10n_requests(mock_aioresponse) == 2
+
+        # Stored on disk and loaded without a request
+        cache = L10nCache(maxEntries=1, directory=str(tmp_path))
+        await cache.get_or_load(
+            "en-US", "1.0.0.R", lambda: sma1._get_json("/data/l10n/en-US.json")
+        )
+        cache.clear()
+        table = await cache.get_or_load("en-US", "1.0.0.R", self._fail)
+        assert table == {461: "SMA", 9402: "Sunny Boy 3.6"}
+        assert cache.get("en-US", "") is None
+
+        # Least recently used table is dropped
+        cache.put("de-DE", "1.0.0.R", {1: "x"})
+        assert cache.get("en-US", "1.0.0.R") is None
+        await session.close()
+
+    async def test_l10n_firmware(self, mock_aioresponse):  # noqa: F811
+        """Test the l10n file is cached by the firmware of the device."""
+        mock_aioresponse.post(
+            f"{self.base_url}/dyn/login.json", payload={"result": {"sid": "ABCD"}}
+        )
+        status = {"6180_08214800": {"1": [{"val": [{"tag": 461}]}]}}
+        firmware = {"6800_00823400": {"1": [{"val": 51387396}]}}
+        update = {"6800_00823400": {"1": [{"val": 51387652}]}}
+        for result in [status, firmware, {**status, **update}]:
+            mock_aioresponse.post(
+                f"{self.base_url}/dyn/getValues.json?sid=ABCD",
+                payload={"result": {"0199-xxxxx385": result}},
+            )
+        session = aiohttp.ClientSession()
+        sma = SMAwebconnect(session, self.host, "pass")
+        sensors = Sensors(
+            [Sensor("6180_08214800", "status", path=JMESPATHS_TAG, l10n_translate=True)]
+        )
+        await sma.read(sensors)
+        assert sensors["status"].value == "SMA"
+        assert sma._l10nFirmware == "3.10.28.R"
+        assert l10nCache.get("en-US", "3.10.28.R") is not None
+        assert self._l10n_requests(mock_aioresponse) == 1
+
+        # Firmware update
+        await sma.read(sensors)
+        assert sma._l10nFirmware == "3.10.29.R"
+        assert self._l10n_requests(mock_aioresponse) == 2
+        await session.close()
+
+    @staticmethod
+    def _l10n_requests(mock_aioresponse):  # noqa: F811
+        return sum(
+            len(calls)
+            for (method, url), calls in mock_aioresponse.requests.items()
+            if "l10n" in str(url)
+        )
+
+    @staticmethod
+    async def _fail():
+        raise AssertionError("Unexpected request")